@@ -0,0 +1,317 @@
+'''
+Computer opponent: iterative-deepening alpha-beta search over the headless engine.
+
+Each of the (up to three) actions of a turn is one ply. The side to move only changes when a turn
+ends, so every node maximizes or minimizes depending on whose turn it is rather than alternating.
+Positions are cached in a transposition table keyed by GameState.zobrist_hash.
+
+Run `poetry run python src/ai.py` to connect a computer player to the server in place of a human client.
+'''
+from __future__ import annotations
+from dataclasses import dataclass
+from enum import IntEnum, auto
+import argparse
+import logging
+import threading
+import time
+
+from classes import GameState, Action, Piece, Location, Side, GameVerdict
+from engine import GameAction, clone_state, legal_actions, make_piece
+from evaluation import PIECE_VALUES, MATERIAL_WEIGHT, CRYSTAL_MOBILITY_WEIGHT
+from model import GameModel
+from view import ActionObserver, NewGameObserver
+
+logger = logging.getLogger(__name__)
+
+WIN_SCORE = 1_000_000
+MAX_TABLE_SIZE = 1_000_000
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Bound(IntEnum):
+    EXACT = auto()
+    LOWER = auto()
+    UPPER = auto()
+
+
+@dataclass
+class TableEntry:
+    depth: int
+    score: int
+    bound: Bound
+    best_action: GameAction | None
+
+
+class AIPlayer:
+    def __init__(self, side: Side, time_budget: float = 1.0, max_depth: int = 9, max_nodes: int | None = None):
+        '''
+        time_budget is the thinking time for a whole turn, shared by the actions left in it
+        max_nodes also stops the search of each action after that many nodes, which unlike time is reproducible
+        '''
+        self.side = side
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self._table: dict[int, TableEntry] = {}
+        self._deadline = 0.0
+        self._turn_spent = 0.0          # time already used by earlier actions of the current turn
+        self.nodes = 0
+        self.completed_depth = 0
+
+    def action_budget(self, state: GameState) -> float:
+        '''Share of the turn's remaining time for the next action'''
+        # moves_made only reaches max_moves when the turn ends on the next action (see GameModel.apply)
+        remaining_actions = state.max_moves - state.moves_made if state.moves_made < state.max_moves else state.max_moves
+        if remaining_actions == state.max_moves:
+            self._turn_spent = 0.0
+        return max(self.time_budget - self._turn_spent, 0.0) / remaining_actions
+
+    def choose_action(self, state: GameState) -> GameAction | None:
+        '''Best action found for the current player within its share of the turn budget (state is left unchanged)'''
+        start = time.perf_counter()
+        self._deadline = start + self.action_budget(state)
+        self.nodes = 0
+        self.completed_depth = 0
+        if len(self._table) > MAX_TABLE_SIZE:
+            self._table.clear()
+        try:
+            return self._iterative_deepening(state)
+        finally:
+            self._turn_spent += time.perf_counter() - start
+
+    def _iterative_deepening(self, state: GameState) -> GameAction | None:
+        model = GameModel(state)
+        best_action: GameAction | None = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, action = self._search_root(model, depth)
+            except SearchTimeout:
+                break
+            if action is not None:
+                best_action = action
+            self.completed_depth = depth
+            if abs(score) >= WIN_SCORE - self.max_depth:
+                break
+
+        if best_action is None:
+            # not even depth 1 finished: fall back to the first ordered action
+            best_action = next(iter(self._ordered_actions(state, None)), None)
+        return best_action
+
+    def _search_root(self, model: GameModel, depth: int) -> tuple[int, GameAction | None]:
+        state = model.state
+        entry = self._table.get(state.zobrist_hash)
+        maximizing = state.curr_player.side == self.side
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_score = alpha if maximizing else beta
+        best_action: GameAction | None = None
+
+        for game_action in self._ordered_actions(state, entry.best_action if entry else None):
+            score = self._search_child(model, game_action, depth - 1, alpha, beta, 1)
+            if maximizing and score > best_score:
+                best_score, best_action = score, game_action
+                alpha = max(alpha, score)
+            elif not maximizing and score < best_score:
+                best_score, best_action = score, game_action
+                beta = min(beta, score)
+
+        self._table[state.zobrist_hash] = TableEntry(depth, best_score, Bound.EXACT, best_action)
+        return best_score, best_action
+
+    def _search_child(self, model: GameModel, game_action: GameAction, depth: int, alpha: int, beta: int, ply: int) -> int:
+        action, _, _, to = game_action
+        record = model.apply(action, make_piece(model.state, game_action), to)
+        try:
+            return self._search(model, depth, alpha, beta, ply)
+        finally:
+            model.undo(record)
+
+    def _search(self, model: GameModel, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchTimeout()
+        if self.nodes & 63 == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        state = model.state
+        if state.game_verdict != GameVerdict.CONTINUE:
+            return self._terminal_score(state.game_verdict, ply)
+        if depth == 0:
+            return self.evaluate(state)
+
+        key = state.zobrist_hash
+        entry = self._table.get(key)
+        if entry and entry.depth >= depth:
+            if entry.bound == Bound.EXACT:
+                return entry.score
+            if entry.bound == Bound.LOWER and entry.score >= beta:
+                return entry.score
+            if entry.bound == Bound.UPPER and entry.score <= alpha:
+                return entry.score
+
+        original_alpha, original_beta = alpha, beta
+        maximizing = state.curr_player.side == self.side
+        best_score = -WIN_SCORE - 1 if maximizing else WIN_SCORE + 1
+        best_action: GameAction | None = None
+
+        for game_action in self._ordered_actions(state, entry.best_action if entry else None):
+            score = self._search_child(model, game_action, depth - 1, alpha, beta, ply + 1)
+            if maximizing:
+                if score > best_score:
+                    best_score, best_action = score, game_action
+                alpha = max(alpha, score)
+            else:
+                if score < best_score:
+                    best_score, best_action = score, game_action
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+
+        if best_action is None:
+            # no legal action: nothing left to search from here
+            return self.evaluate(state)
+
+        if best_score <= original_alpha:
+            bound = Bound.UPPER
+        elif best_score >= original_beta:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        self._table[key] = TableEntry(depth, best_score, bound, best_action)
+        return best_score
+
+    def _ordered_actions(self, state: GameState, best_action: GameAction | None) -> list[GameAction]:
+        '''Previous best action first, then captures (most valuable victim, least valuable attacker), then the rest'''
+        board = state.board
+        captures: list[tuple[int, GameAction]] = []
+        quiet: list[GameAction] = []
+        drops: list[GameAction] = []
+        for game_action in legal_actions(state):
+            action, piece_kind, _, to = game_action
+            if action == Action.DROP:
+                drops.append(game_action)
+                continue
+            target = board.get_piece(to)
+            if target:
+                captures.append((PIECE_VALUES[target.piece_kind] * 16 - PIECE_VALUES[piece_kind], game_action))
+            else:
+                quiet.append(game_action)
+
+        captures.sort(key=lambda scored: scored[0], reverse=True)
+        ordered = [game_action for _, game_action in captures] + quiet + drops
+        if best_action is not None and best_action in ordered:
+            ordered.remove(best_action)
+            ordered.insert(0, best_action)
+        return ordered
+
+    def _terminal_score(self, verdict: GameVerdict, ply: int) -> int:
+        match verdict:
+            case GameVerdict.BLUE_WINNER:
+                winner = Side.BLUE
+            case GameVerdict.RED_WINNER:
+                winner = Side.RED
+            case _:
+                return 0
+        # prefer faster wins and slower losses
+        return WIN_SCORE - ply if winner == self.side else -WIN_SCORE + ply
+
+    def evaluate(self, state: GameState) -> int:
+        '''Material (on the board and stored) and crystal mobility, from the point of view of this player'''
+        board = state.board
+        score = 0
+        for player in (state.red_player, state.blue_player):
+            material = sum(PIECE_VALUES[piece.piece_kind] for piece in board.get_pieces(player.side))
+            material += sum(PIECE_VALUES[piece_kind] * len(stored) for piece_kind, stored in player.stored_pieces.items())
+            mobility = board.get_crystal_mobility(player.side)
+
+            value = material * MATERIAL_WEIGHT + mobility * CRYSTAL_MOBILITY_WEIGHT
+            score += value if player.side == self.side else -value
+        return score
+
+
+class AIView:
+    '''Headless View that lets GameController play one side with an AIPlayer instead of a human'''
+    def __init__(self, variant: int = 4, time_budget: float = 1.0):
+        self._variant = variant                     # board chosen when playing as Player 1
+        self._time_budget = time_budget
+        self._state: GameState | None = None
+        self._state_changed = threading.Event()
+        self._game_started = False
+        self._last_decision: int | None = None
+        self._player: AIPlayer | None = None          # kept for the whole game so it can split its turn budget
+
+        self._action_observers: list[ActionObserver] = []
+        self._new_game_observers: list[NewGameObserver] = []
+
+    def on_state_change(self, state: GameState): #protocol
+        self._state = state
+        self._state_changed.set()
+
+    def run(self):
+        while True:
+            self._state_changed.wait()
+            self._state_changed.clear()
+            state = self._state
+            if state is None:
+                continue
+
+            if not self._game_started:
+                # same handshake as the menu screen of the pygame view
+                if state.network_id == 1 and state.is_P2_connected:
+                    self._game_started = True
+                    self._on_new_game(self._variant)
+                elif state.network_id == 2 and state.P1board_variant != 0:
+                    self._game_started = True
+                    self._on_new_game(state.P1board_variant)
+                continue
+
+            if state.game_verdict != GameVerdict.CONTINUE:
+                logger.info(f'Game over: {state.game_verdict}')
+                return
+
+            side = Side.BLUE if state.network_id == 1 else Side.RED
+            if state.curr_player.side != side or state.zobrist_hash == self._last_decision:
+                continue
+
+            # search on a copy, the network thread keeps updating the shared state
+            self._last_decision = state.zobrist_hash
+            if self._player is None:
+                self._player = AIPlayer(side, self._time_budget)
+            game_action = self._player.choose_action(clone_state(state))
+            if game_action is not None:
+                action, _, _, to = game_action
+                self._on_action(action, make_piece(state, game_action), to)
+
+    def _on_action(self, action: Action, piece: Piece, to: Location):
+        for observer in self._action_observers:
+            observer.on_action(action, piece, to)
+
+    def _on_new_game(self, variant: int):
+        for observer in self._new_game_observers:
+            observer.on_new_game(variant)
+
+    def register_action_observer(self, observer: ActionObserver):
+        self._action_observers.append(observer)
+
+    def register_new_game_observer(self, observer: NewGameObserver):
+        self._new_game_observers.append(observer)
+
+
+if __name__ == "__main__":
+    from controller import GameController
+
+    parser = argparse.ArgumentParser(description='Connect a computer player to the Battlegrid server')
+    parser.add_argument('--variant', type=int, default=4, help='board variant to pick when playing as Player 1')
+    parser.add_argument('--time', type=float, default=1.0, help='thinking time per turn, in seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    model = GameModel.default_game()
+    view = AIView(args.variant, args.time)
+
+    controller = GameController(model, view)
+    controller.start()
@@ -0,0 +1,300 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterable, Mapping, Sequence, TYPE_CHECKING
+from classes import Board, GameState, Piece, PieceKind, Location, Side, GameVerdict, piece_mappings
+from compactboard import BoardLayout, CompactBoard, BLUE_FLAG, EMPTY, KIND_CODES, encode_piece
+from evaluation import PIECE_VALUES, MATERIAL_WEIGHT, CRYSTAL_MOBILITY_WEIGHT
+
+try:
+    import numpy as np
+except ImportError:     # optional, only needed for bulk analysis
+    np = None
+
+if TYPE_CHECKING:
+    import numpy.typing as npt
+
+KIND_MASK = BLUE_FLAG - 1   # cell code bits holding the piece kind
+
+
+'''
+Vectorized board backend for bulk analysis (optional, requires numpy).
+
+A BitBoards holds many positions of the same board layout as a (positions, rows, cols) array of
+compactboard cell codes. Move generation works on whole boolean planes: the destinations of every
+piece of one kind and side are found at once by shifting its occupancy plane by each Movement delta,
+so counting moves, drops or crystal mobility never loops over pieces in Python.
+
+The interactive game keeps using Board; this is meant for analytics over thousands of positions.
+
+A whole position (board, stored pieces and side to move) encodes to a fixed-length byte string per
+layout, so logged positions can be stored compactly and scored in batches with PositionBatch.
+'''
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError('bitboard requires numpy (poetry install --extras analysis)')
+
+
+def shift(plane: npt.NDArray[np.bool_], row_delta: int, col_delta: int) -> npt.NDArray[np.bool_]:
+    '''Moves every cell of (positions, rows, cols) planes by a delta; cells shifted off the board are dropped'''
+    rows, cols = plane.shape[-2:]
+    shifted = np.zeros_like(plane)
+    if abs(row_delta) >= rows or abs(col_delta) >= cols:
+        return shifted
+    shifted[..., max(row_delta, 0):rows + min(row_delta, 0), max(col_delta, 0):cols + min(col_delta, 0)] = \
+        plane[..., max(-row_delta, 0):rows - max(row_delta, 0), max(-col_delta, 0):cols - max(col_delta, 0)]
+    return shifted
+
+
+class BitBoards:
+    '''A batch of positions of one board layout, with vectorized move, drop and verdict queries'''
+
+    @classmethod
+    def from_boards(cls, boards: Iterable[Board | CompactBoard]) -> BitBoards:
+        '''Encodes boards that all share the same variant and size'''
+        require_numpy()
+        compact = [board if isinstance(board, CompactBoard) else CompactBoard.from_board(board) for board in boards]
+        if not compact:
+            raise ValueError('at least one board is needed to know the layout')
+        layout = compact[0].layout
+        if any(board.layout is not layout for board in compact):
+            raise ValueError('all boards must share the same layout')
+        cells = np.frombuffer(b''.join(bytes(board.cells) for board in compact), dtype=np.uint8)
+        return cls(layout, cells.reshape(len(compact), layout.rows, layout.cols))
+
+    def __init__(self, layout: BoardLayout, cells: npt.NDArray[np.uint8]):
+        require_numpy()
+        if cells.ndim == 2:
+            cells = cells[np.newaxis]
+        if cells.shape[1:] != (layout.rows, layout.cols):
+            raise ValueError(f'cells must have shape (positions, {layout.rows}, {layout.cols})')
+        self._layout = layout
+        self._cells = cells
+        self._walkable = np.array(
+            [[layout.walkable_mask >> (i * layout.cols + j) & 1 for j in range(layout.cols)] for i in range(layout.rows)],
+            dtype=np.bool_,
+        )
+
+    def __len__(self) -> int:
+        return self._cells.shape[0]
+
+    @property
+    def layout(self) -> BoardLayout:
+        return self._layout
+
+    @property
+    def cells(self) -> npt.NDArray[np.uint8]:
+        return self._cells
+
+    @property
+    def walkable(self) -> npt.NDArray[np.bool_]:
+        return self._walkable
+
+    def occupancy(self, piece_kind: PieceKind, side: Side) -> npt.NDArray[np.bool_]:
+        return self._cells == encode_piece(piece_kind, side)
+
+    def side_occupancy(self, side: Side) -> npt.NDArray[np.bool_]:
+        blue = (self._cells & BLUE_FLAG) != 0
+        return (self._cells != EMPTY) & (blue if side == Side.BLUE else ~blue)
+
+    def empty(self) -> npt.NDArray[np.bool_]:
+        return self._cells == EMPTY
+
+    def _targets(self, piece_kind: PieceKind, side: Side) -> npt.NDArray[np.bool_]:
+        '''Cells a piece of the given kind and side may end on: empty, or an enemy non-crystal for attackers'''
+        empty = self.empty()
+        if piece_kind == PieceKind.CRYSTAL:
+            return empty & self._walkable
+        enemy = self.side_occupancy(Side.RED if side == Side.BLUE else Side.BLUE)
+        enemy &= (self._cells & KIND_MASK) != KIND_CODES[PieceKind.CRYSTAL]
+        return (empty | enemy) & self._walkable
+
+    def _destination_planes(self, piece_kind: PieceKind, side: Side) -> Iterable[npt.NDArray[np.bool_]]:
+        '''One plane per Movement delta; the planes of different deltas never share a (piece, destination) pair'''
+        occupied = self.occupancy(piece_kind, side)
+        targets = self._targets(piece_kind, side)
+        _, movement = piece_mappings[piece_kind]
+        for delta in movement.oriented_deltas(side):
+            yield shift(occupied, delta.row, delta.col) & targets
+
+    def valid_move_mask(self, piece_kind: PieceKind, side: Side) -> npt.NDArray[np.bool_]:
+        '''Cells any piece of the given kind and side can move to, per position'''
+        mask = np.zeros(self._cells.shape, dtype=np.bool_)
+        for plane in self._destination_planes(piece_kind, side):
+            mask |= plane
+        return mask
+
+    def move_counts(self, piece_kind: PieceKind, side: Side) -> npt.NDArray[np.int64]:
+        '''Number of (piece, destination) moves of the given kind and side, per position'''
+        counts = np.zeros(len(self), dtype=np.int64)
+        for plane in self._destination_planes(piece_kind, side):
+            counts += plane.sum(axis=(1, 2))
+        return counts
+
+    def all_move_counts(self, side: Side) -> npt.NDArray[np.int64]:
+        '''Number of moves of every piece of a side, per position (what Board.get_valid_moves sums to)'''
+        counts = np.zeros(len(self), dtype=np.int64)
+        for piece_kind in PieceKind:
+            counts += self.move_counts(piece_kind, side)
+        return counts
+
+    def valid_drop_mask(self) -> npt.NDArray[np.bool_]:
+        '''Empty walkable cells that no crystal can reach, per position (Board.get_valid_drops)'''
+        reach = np.zeros(self._cells.shape, dtype=np.bool_)
+        _, movement = piece_mappings[PieceKind.CRYSTAL]
+        for side in Side:
+            crystals = self.occupancy(PieceKind.CRYSTAL, side)
+            for delta in movement.oriented_deltas(side):
+                reach |= shift(crystals, delta.row, delta.col)
+        return self.empty() & self._walkable & ~reach
+
+    def drop_counts(self) -> npt.NDArray[np.int64]:
+        return self.valid_drop_mask().sum(axis=(1, 2))
+
+    def crystal_mobility(self, side: Side) -> npt.NDArray[np.int64]:
+        '''Total number of moves of a side's crystals, per position'''
+        return self.move_counts(PieceKind.CRYSTAL, side)
+
+    def can_still_move(self) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+        '''Whether blue and red can still move a crystal, per position (no crystal at all means it cannot)'''
+        return self.crystal_mobility(Side.BLUE) > 0, self.crystal_mobility(Side.RED) > 0
+
+    def verdicts(self) -> list[GameVerdict]:
+        '''The verdict GameModel.check_game_result would give each position'''
+        can_blue_still_move, can_red_still_move = self.can_still_move()
+        verdicts: list[GameVerdict] = []
+        for blue, red in zip(can_blue_still_move.tolist(), can_red_still_move.tolist()):
+            if not blue and not red:
+                verdicts.append(GameVerdict.DRAW)
+            elif not blue:
+                verdicts.append(GameVerdict.RED_WINNER)
+            elif not red:
+                verdicts.append(GameVerdict.BLUE_WINNER)
+            else:
+                verdicts.append(GameVerdict.CONTINUE)
+        return verdicts
+
+
+# order of the stored piece counts in an encoded position
+STORED_KINDS: tuple[PieceKind, ...] = tuple(piece_kind for piece_kind in KIND_CODES if piece_kind != PieceKind.CRYSTAL)
+SIDES: tuple[Side, ...] = (Side.RED, Side.BLUE)
+
+
+def encoded_size(layout: BoardLayout) -> int:
+    '''Bytes per encoded position: cells, stored counts of red then blue, side to move'''
+    return layout.rows * layout.cols + len(SIDES) * len(STORED_KINDS) + 1
+
+
+def encode_position(state: GameState) -> bytes:
+    '''Compact form of a position: its board cells, stored piece counts and side to move (1 if blue)'''
+    stored = bytes(
+        len(player.stored_pieces[piece_kind])
+        for player in (state.red_player, state.blue_player) for piece_kind in STORED_KINDS
+    )
+    to_move = bytes([state.curr_player.side == Side.BLUE])
+    return bytes(CompactBoard.from_board(state.board).cells) + stored + to_move
+
+
+def decode_position(layout: BoardLayout, encoded: bytes) -> GameState:
+    '''Rebuilds a playable GameState (at the start of a turn) from encode_position output'''
+    n_cells = layout.rows * layout.cols
+    state = GameState(CompactBoard(layout, bytearray(encoded[:n_cells])).to_board())
+    counts = encoded[n_cells:n_cells + len(SIDES) * len(STORED_KINDS)]
+    for side_index, player in enumerate((state.red_player, state.blue_player)):
+        for kind_index, piece_kind in enumerate(STORED_KINDS):
+            for _ in range(counts[side_index * len(STORED_KINDS) + kind_index]):
+                player.capture_piece(Piece(piece_mappings[piece_kind], Location(-1, -1), player.side))
+    state.curr_player = state.blue_player if encoded[-1] else state.red_player
+    return state
+
+
+@dataclass
+class BatchEvaluation:
+    '''Per-position results of PositionBatch.evaluate, every array has one entry per position'''
+    verdicts: list[GameVerdict]
+    crystal_mobility: dict[Side, npt.NDArray[np.int64]]
+    material: dict[Side, npt.NDArray[np.int64]]
+    legal_action_counts: npt.NDArray[np.int64]
+
+
+class PositionBatch:
+    '''Encoded positions of one layout (boards, stored pieces and side to move) scored all at once'''
+
+    @classmethod
+    def from_states(cls, states: Iterable[GameState]) -> PositionBatch:
+        states = list(states)
+        if not states:
+            raise ValueError('at least one position is needed to know the layout')
+        return cls.from_encoded(BoardLayout.of(states[0].board), [encode_position(state) for state in states])
+
+    @classmethod
+    def from_encoded(cls, layout: BoardLayout, encoded: Sequence[bytes] | npt.NDArray[np.uint8]) -> PositionBatch:
+        '''Positions from encode_position, either as byte strings or as a (positions, encoded_size) array'''
+        require_numpy()
+        if not isinstance(encoded, np.ndarray):
+            encoded = np.frombuffer(b''.join(encoded), dtype=np.uint8).reshape(len(encoded), -1)
+        if encoded.ndim != 2 or encoded.shape[1] != encoded_size(layout):
+            raise ValueError(f'encoded positions must be {encoded_size(layout)} bytes each')
+        return cls(layout, encoded)
+
+    def __init__(self, layout: BoardLayout, encoded: npt.NDArray[np.uint8]):
+        n_cells = layout.rows * layout.cols
+        self._encoded = encoded
+        self._boards = BitBoards(layout, encoded[:, :n_cells].reshape(-1, layout.rows, layout.cols))
+        # (positions, side, stored kind), sides in SIDES order
+        self._stored = encoded[:, n_cells:-1].astype(np.int64).reshape(-1, len(SIDES), len(STORED_KINDS))
+        self._blue_to_move = encoded[:, -1] != 0
+
+    def __len__(self) -> int:
+        return len(self._boards)
+
+    @property
+    def boards(self) -> BitBoards:
+        return self._boards
+
+    @property
+    def encoded(self) -> npt.NDArray[np.uint8]:
+        return self._encoded
+
+    def stored_counts(self, side: Side) -> npt.NDArray[np.int64]:
+        '''(positions, stored kind) counts of a side's stored pieces, kinds in STORED_KINDS order'''
+        return self._stored[:, SIDES.index(side)]
+
+    def material(self, side: Side, values: Mapping[PieceKind, int] = PIECE_VALUES) -> npt.NDArray[np.int64]:
+        '''Value of a side's pieces on the board and in store, per position'''
+        board_counts = np.stack(
+            [self._boards.occupancy(piece_kind, side).sum(axis=(1, 2)) for piece_kind in PieceKind], axis=1
+        )
+        board_values = np.array([values[piece_kind] for piece_kind in PieceKind], dtype=np.int64)
+        stored_values = np.array([values[piece_kind] for piece_kind in STORED_KINDS], dtype=np.int64)
+        return board_counts @ board_values + self.stored_counts(side) @ stored_values
+
+    def legal_action_counts(self) -> npt.NDArray[np.int64]:
+        '''Number of actions of the side to move (engine.count_legal_actions), 0 once the game is over'''
+        boards = self._boards
+        drops = boards.drop_counts()
+        counts = {
+            side: boards.all_move_counts(side) + (self.stored_counts(side) > 0).sum(axis=1) * drops
+            for side in SIDES
+        }
+        can_blue_still_move, can_red_still_move = boards.can_still_move()
+        counts_to_move = np.where(self._blue_to_move, counts[Side.BLUE], counts[Side.RED])
+        return np.where(can_blue_still_move & can_red_still_move, counts_to_move, 0)
+
+    def scores(self, side: Side) -> npt.NDArray[np.int64]:
+        '''AIPlayer.evaluate from the point of view of a side, per position'''
+        value = {
+            s: self.material(s) * MATERIAL_WEIGHT + self._boards.crystal_mobility(s) * CRYSTAL_MOBILITY_WEIGHT
+            for s in SIDES
+        }
+        other = Side.RED if side == Side.BLUE else Side.BLUE
+        return value[side] - value[other]
+
+    def evaluate(self) -> BatchEvaluation:
+        return BatchEvaluation(
+            verdicts=self._boards.verdicts(),
+            crystal_mobility={side: self._boards.crystal_mobility(side) for side in SIDES},
+            material={side: self.material(side) for side in SIDES},
+            legal_action_counts=self.legal_action_counts(),
+        )
@@ -1,7 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from enum import StrEnum, IntEnum, auto
-from typing import Self, Sequence
+from functools import cache
+import logging
+import random
+from typing import Self, Sequence, Iterable, AbstractSet, Collection
+
+
+logger = logging.getLogger(__name__)
 
 
 class NetworkID(IntEnum):
@@ -27,16 +33,11 @@ class MessageType(IntEnum):
     MADE_ACTION = 3
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Location:
     row: int
     col: int
 
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, Location):
-            return False
-        return self.row == other.row and self.col == other.col
-
     def __mul__(self, n: int) -> Location:
         return Location(self.row * n, self.col * n)
 
@@ -61,9 +62,23 @@ class Movement:
 
     SIDES = [Location(0, -1), Location(0, +1)]
 
+    def __init__(self):
+        self._oriented_deltas: dict[Side, tuple[Location, ...]] = {}
+
     def get_deltas(self) -> list[Location]:
         ...
 
+    def oriented_deltas(self, side: Side) -> tuple[Location, ...]:
+        '''Deltas as seen from the given side, computed once per side'''
+        deltas = self._oriented_deltas.get(side)
+        if deltas is None:
+            if side == Side.RED:
+                deltas = tuple(Location(-loc.row, -loc.col) for loc in self.get_deltas())
+            else:
+                deltas = tuple(self.get_deltas())
+            self._oriented_deltas[side] = deltas
+        return deltas
+
 
 # movements are always relative to the BLUE side (bottom side)
 class SwordsmanMovement(Movement):
@@ -146,6 +161,32 @@ piece_mappings: dict[PieceKind, tuple[PieceKind, Movement]] = {
 }
 
 
+'''
+Zobrist hashing: every (piece kind, side, cell), (side, stored kind, stored count), side to move and
+moves_made gets a fixed random 64-bit key, and a position hashes to the XOR of the keys it contains.
+Board and Player keep their part of the hash up to date as pieces are placed, removed, captured and used.
+'''
+ZOBRIST_SEED = 150241
+MAX_STORED_COUNT = 256
+MAX_MOVES_MADE = 16
+
+_zobrist_random = random.Random(ZOBRIST_SEED)
+ZOBRIST_STORED_KEYS: dict[tuple[Side, PieceKind], list[int]] = {
+    # a count of 0 hashes to 0 so that an empty store does not contribute
+    (side, piece_kind): [0] + [_zobrist_random.getrandbits(64) for _ in range(MAX_STORED_COUNT)]
+    for side in Side for piece_kind in PieceKind
+}
+ZOBRIST_RED_TO_MOVE_KEY = _zobrist_random.getrandbits(64)
+ZOBRIST_MOVES_MADE_KEYS = [_zobrist_random.getrandbits(64) for _ in range(MAX_MOVES_MADE)]
+
+
+@cache
+def zobrist_cell_keys(n_cells: int) -> dict[tuple[PieceKind, Side], list[int]]:
+    '''Keys for each (piece kind, side) per cell; the same for every board with the same number of cells'''
+    rng = random.Random(ZOBRIST_SEED + n_cells)
+    return {(piece_kind, side): [rng.getrandbits(64) for _ in range(n_cells)] for piece_kind in PieceKind for side in Side}
+
+
 class Player:
     def __init__(self, side: Side):
         self.side = side
@@ -156,18 +197,44 @@ class Player:
             PieceKind.GUARD: [],
             PieceKind.LONGSWORD: [],
         }
+        self._zobrist_hash = 0
+
+    def _store(self, piece: Piece):
+        stored = self.stored_pieces[piece.piece_kind]
+        keys = ZOBRIST_STORED_KEYS[self.side, piece.piece_kind]
+        self._zobrist_hash ^= keys[len(stored)] ^ keys[len(stored) + 1]
+        stored.append(piece)
+
+    def _unstore(self, piece_kind: PieceKind) -> Piece:
+        stored = self.stored_pieces[piece_kind]
+        keys = ZOBRIST_STORED_KEYS[self.side, piece_kind]
+        self._zobrist_hash ^= keys[len(stored)] ^ keys[len(stored) - 1]
+        return stored.pop()
 
     def capture_piece(self, piece: Piece):
         '''Append captured piece to list of available pieces'''
         piece.side = self.side
-        self.stored_pieces[piece.piece_kind].append(piece)
+        self._store(piece)
 
-    def use_piece(self, piece: Piece):
-        '''Use a piece that you have stored'''
+    def use_piece(self, piece: Piece) -> Piece | None:
+        '''Use a piece that you have stored (returns the stored piece that was used up)'''
         if len(self.stored_pieces[piece.piece_kind]) == 0:
-            print('cannot use a piece that you don\'t have')
-            return
-        self.stored_pieces[piece.piece_kind].pop()
+            logger.warning('cannot use a piece that you don\'t have')
+            return None
+        return self._unstore(piece.piece_kind)
+
+    def undo_capture(self, piece_kind: PieceKind) -> Piece:
+        '''Takes back the most recently captured piece of a kind'''
+        return self._unstore(piece_kind)
+
+    def undo_use(self, piece: Piece):
+        '''Puts back a stored piece that was used up by use_piece'''
+        self._store(piece)
+
+    @property
+    def zobrist_hash(self) -> int:
+        '''Hash of the stored piece counts'''
+        return self._zobrist_hash
 
 
 class Piece:
@@ -180,7 +247,7 @@ class Piece:
     def can_move(self, to: Location) -> bool:
         '''Checks if a piece can move to a certain location'''
         return any(
-            True for loc in self.correct_orientation(self._movement.get_deltas())
+            True for loc in self._movement.oriented_deltas(self.side)
             if self.location.row + loc.row == to.row and
             self.location.col + loc.col == to.col
         )
@@ -196,7 +263,7 @@ class Piece:
     @property
     def all_possible_moves(self) -> list[Location]:
         return [Location(self.location.row + loc.row, self.location.col + loc.col) 
-         for loc in self.correct_orientation(self._movement.get_deltas())]
+         for loc in self._movement.oriented_deltas(self.side)]
 
     def correct_orientation(self, deltas: list[Location]) -> list[Location]:
         '''Reverses orientation when at red side'''
@@ -250,6 +317,21 @@ class GameState:
     def max_moves(self):
         return self._max_moves
 
+    @property
+    def zobrist_hash(self) -> int:
+        '''64-bit hash of the position: board, stored pieces, side to move and moves made this turn'''
+        h = self.board.zobrist_hash ^ self.red_player.zobrist_hash ^ self.blue_player.zobrist_hash
+        if self.curr_player.side == Side.RED:
+            h ^= ZOBRIST_RED_TO_MOVE_KEY
+        return h ^ ZOBRIST_MOVES_MADE_KEYS[self.moves_made]
+
+
+# (piece kind, side) -> destinations per cell, indexed by row * cols + col
+MoveTable = dict[tuple[PieceKind, Side], tuple[tuple[Location, ...], ...]]
+
+# move tables only depend on the board layout, so boards of the same variant share one
+_move_tables: dict[tuple[int, int, frozenset[Location]], MoveTable] = {}
+
 
 '''
 To add a new board variant:
@@ -260,14 +342,55 @@ To add a new board variant:
 - Let ClassicBoard = 1, format of "boardtextures" key and value can be referred at sprites.py
 '''
 class Board:
-    def __init__(self, rows: int, cols: int, impassable_terrain: list[Location], variant: int):
+    def __init__(self, rows: int, cols: int, impassable_terrain: Iterable[Location], variant: int):
         self._rows = rows
         self._cols = cols
         self._variant = variant
-        self._impassable_terrain: list[Location] = impassable_terrain
+        self._impassable_terrain: frozenset[Location] = frozenset(impassable_terrain)
         self._grid: list[list[Tile]] = [[Tile(None, False) if Location(i,j) in self._impassable_terrain else Tile(None, True) for j in range(self._cols)] for i in range(self._rows)]
+        self._move_table = self._build_move_table()
         self.red_crystals: list[Piece] = []
         self.blue_crystals: list[Piece] = []
+
+        # pieces on the board per side, by location
+        # (a captured piece changes side before it is removed, so the side it was placed with is kept here)
+        self._pieces: dict[Side, dict[Location, Piece]] = {Side.RED: {}, Side.BLUE: {}}
+        self._zobrist_keys = zobrist_cell_keys(self._rows * self._cols)
+        self._zobrist_hash = 0
+
+        # drop-eligible cells: empty, walkable and not reachable by any crystal
+        # maintained by place_piece/remove_piece through per-side, per-cell counts of neighboring crystals
+        self._crystal_neighbors: dict[Side, list[int]] = {side: [0] * (self._rows * self._cols) for side in Side}
+        # number of (crystal, empty cell it can move to) pairs per side, the game is lost when it drops to 0
+        self._crystal_mobility: dict[Side, int] = {Side.RED: 0, Side.BLUE: 0}
+        # crystals of red_crystals/blue_crystals by location, to keep them in sync with moved crystal pieces
+        self._tracked_crystals: dict[Side, dict[Location, Piece]] = {Side.RED: {}, Side.BLUE: {}}
+        self._valid_drops: set[Location] = {
+            Location(i,j) for i in range(self._rows) for j in range(self._cols) if self._grid[i][j].walkable
+        }
+
+    def _build_move_table(self) -> MoveTable:
+        '''Precomputes the in-bounds, walkable destinations of every piece kind and side from every cell'''
+        key = (self._rows, self._cols, self._impassable_terrain)
+        table = _move_tables.get(key)
+        if table is not None:
+            return table
+
+        table = {}
+        for piece_kind, movement in piece_mappings.values():
+            for side in Side:
+                deltas = movement.oriented_deltas(side)
+                table[piece_kind, side] = tuple(
+                    tuple(
+                        Location(i + loc.row, j + loc.col) for loc in deltas
+                        if 0 <= i + loc.row < self._rows and 0 <= j + loc.col < self._cols
+                        and self._grid[i + loc.row][j + loc.col].walkable
+                    )
+                    for i in range(self._rows)
+                    for j in range(self._cols)
+                )
+        _move_tables[key] = table
+        return table
     
     def get_tile(self, location: Location) -> Tile:
         return self._grid[location.row][location.col]
@@ -279,29 +402,85 @@ class Board:
     def place_piece(self, piece: Piece, location: Location):
         '''Places a specific piece at a particular location (if valid)'''
         if not self.is_valid_location(location):
-            print('cannot place a piece at an invalid location')
+            logger.warning('cannot place a piece at an invalid location')
             return
-        if location in self._impassable_terrain:
-            print('cannot place a piece on impassable terrain')
+        if not self.get_tile(location).walkable:
+            logger.warning('cannot place a piece on impassable terrain')
             return
         if self.get_tile(location).piece is not None:
-            print('cannot place a piece on an occupied location')
+            logger.warning('cannot place a piece on an occupied location')
             return
         # update crystals list
         if piece.piece_kind == PieceKind.CRYSTAL:
-            crystals = self.blue_crystals if piece.side == Side.BLUE else self.red_crystals
-            for c in crystals:
-                if c.side == piece.side and c.location == piece.location:
-                    c.location = location
+            tracked = self._tracked_crystals[piece.side]
+            crystal = tracked.pop(piece.location, None)
+            if crystal is not None:
+                crystal.location = location
+                tracked[location] = crystal
 
         piece.location = location
         self.get_tile(location).piece = piece
+        self._pieces[piece.side][location] = piece
+        index = location.row * self._cols + location.col
+        self._zobrist_hash ^= self._zobrist_keys[piece.piece_kind, piece.side][index]
+
+        # the cell is no longer free for the crystals next to it
+        if self._is_crystal_reachable(index):
+            for side, neighbors in self._crystal_neighbors.items():
+                self._crystal_mobility[side] -= neighbors[index]
+        self._valid_drops.discard(location)
+        if piece.piece_kind == PieceKind.CRYSTAL:
+            neighbors = self._crystal_neighbors[piece.side]
+            for neighbor in self._crystal_reach(piece.side, location):
+                neighbors[neighbor.row * self._cols + neighbor.col] += 1
+                self._valid_drops.discard(neighbor)
+                if self.get_tile(neighbor).piece is None:
+                    self._crystal_mobility[piece.side] += 1
 
     def remove_piece(self, location: Location):
         '''Removes a piece at a specified location'''
         if not self.is_valid_location(location):
-            print('cannot remove a piece at an invalid location')
-        self.get_tile(location).piece = None
+            logger.warning('cannot remove a piece at an invalid location')
+            return
+        tile = self.get_tile(location)
+        piece = tile.piece
+        tile.piece = None
+        index = location.row * self._cols + location.col
+        if piece is not None:
+            side = Side.RED if location in self._pieces[Side.RED] else Side.BLUE
+            del self._pieces[side][location]
+            self._zobrist_hash ^= self._zobrist_keys[piece.piece_kind, side][index]
+            # the cell is free again for the crystals next to it
+            if self._is_crystal_reachable(index):
+                for side, neighbors in self._crystal_neighbors.items():
+                    self._crystal_mobility[side] += neighbors[index]
+
+        if piece is not None and piece.piece_kind == PieceKind.CRYSTAL:
+            neighbors = self._crystal_neighbors[piece.side]
+            for neighbor in self._crystal_reach(piece.side, location):
+                neighbor_index = neighbor.row * self._cols + neighbor.col
+                neighbors[neighbor_index] -= 1
+                if self.get_tile(neighbor).piece is None:
+                    self._crystal_mobility[piece.side] -= 1
+                    if not self._is_crystal_reachable(neighbor_index):
+                        self._valid_drops.add(neighbor)
+        if tile.walkable and not self._is_crystal_reachable(index):
+            self._valid_drops.add(location)
+
+    def get_pieces(self, side: Side) -> Collection[Piece]:
+        '''Pieces of a side currently on the board (a live view; copy it before changing the board while iterating)'''
+        return self._pieces[side].values()
+
+    def _crystal_reach(self, side: Side, location: Location) -> tuple[Location, ...]:
+        '''Cells a crystal at the given location could move to on an empty board'''
+        return self._move_table[PieceKind.CRYSTAL, side][location.row * self._cols + location.col]
+
+    def _is_crystal_reachable(self, index: int) -> bool:
+        return self._crystal_neighbors[Side.RED][index] > 0 or self._crystal_neighbors[Side.BLUE][index] > 0
+
+    def get_crystal_mobility(self, side: Side) -> int:
+        '''Total number of valid moves of a side's crystals (0 when it has no crystal left to move)'''
+        return self._crystal_mobility[side]
 
     def is_valid_location(self, location: Location) -> bool:
         '''Checks if a location is valid (i.e., it doesn't goes out of range)'''
@@ -332,25 +511,29 @@ class Board:
 
     def get_valid_moves(self, piece: Piece) -> list[Location]:
         '''Filters all valid moves from all possible moves'''
-        movelist = piece.all_possible_moves
-        return [move for move in movelist if self.is_valid_move(piece, move)]
+        location = piece.location
+        if not (0 <= location.row < self._rows and 0 <= location.col < self._cols):
+            movelist = piece.all_possible_moves
+            return [move for move in movelist if self.is_valid_move(piece, move)]
+
+        # destinations are already in range and walkable, only occupancy is left to check
+        grid = self._grid
+        destinations = self._move_table[piece.piece_kind, piece.side][location.row * self._cols + location.col]
+        if piece.is_protected_piece:
+            return [to for to in destinations if grid[to.row][to.col].piece is None]
+        side = piece.side
+        return [
+            to for to in destinations
+            if (target := grid[to.row][to.col].piece) is None
+            or (target.side != side and target.piece_kind != PieceKind.CRYSTAL)
+        ]
     
-    def get_valid_drops(self) -> list[Location]:
-        '''Gets all possible and valid drop locations'''
-        all_crystals = self.red_crystals + self.blue_crystals
-        valid_crystal_moves: list[Location] = []
-        for crystal in all_crystals:
-            valid_crystal_moves += self.get_valid_moves(crystal)
-
-        restricted_locations = self.impassable_terrain + valid_crystal_moves
-
-        droplist: list[Location] = []
-        for i in range(self._rows):
-            for j in range(self._cols):
-                if self.get_piece(Location(i,j)) is None and Location(i,j) not in restricted_locations:
-                    droplist.append(Location(i,j))
-        
-        return droplist 
+    def get_valid_drops(self) -> AbstractSet[Location]:
+        '''
+        Gets all possible and valid drop locations
+        The returned set is kept up to date by the board; copy it before changing the board while iterating
+        '''
+        return self._valid_drops
 
     def _initialize_pieces(self, initial_positions: Sequence[Sequence[str | None]]):
         guard = piece_mappings[PieceKind.GUARD]
@@ -379,6 +562,7 @@ class Board:
                         case 'C':
                             crystal_piece = Piece(crystal, Location(r, c), side, True)
                             self.red_crystals.append(crystal_piece) if side == side.RED else self.blue_crystals.append(crystal_piece)
+                            self._tracked_crystals[side][Location(r, c)] = crystal_piece
                             self.place_piece(crystal_piece, Location(r, c))
                         case _:
                             pass
@@ -396,9 +580,18 @@ class Board:
         return self._variant
 
     @property
-    def impassable_terrain(self) -> list[Location]:
+    def impassable_terrain(self) -> frozenset[Location]:
         return self._impassable_terrain
 
+    @property
+    def move_table(self) -> MoveTable:
+        return self._move_table
+
+    @property
+    def zobrist_hash(self) -> int:
+        '''Hash of the pieces on the board, maintained by place_piece and remove_piece'''
+        return self._zobrist_hash
+
 
 class RushBoard(Board): 
     def __init__(self):
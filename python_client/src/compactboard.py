@@ -0,0 +1,261 @@
+from __future__ import annotations
+import logging
+from classes import Board, Tile, Piece, PieceKind, Side, Location, piece_mappings
+
+
+'''
+Compact board storage: one byte per cell instead of a Tile and a Piece object per cell.
+
+A cell byte is 0 when empty, otherwise the piece kind code (1 to 6) with BLUE_FLAG set for blue pieces.
+Walkability lives in a single integer bitmask (bit row * cols + col) shared by every position of the
+same layout, so a stored position costs little more than its bytearray.
+'''
+logger = logging.getLogger(__name__)
+
+EMPTY = 0
+BLUE_FLAG = 8
+
+KIND_CODES: dict[PieceKind, int] = {
+    PieceKind.SWORDSMAN: 1,
+    PieceKind.MAGE: 2,
+    PieceKind.ARCHER: 3,
+    PieceKind.GUARD: 4,
+    PieceKind.LONGSWORD: 5,
+    PieceKind.CRYSTAL: 6,
+}
+CODE_KINDS: dict[int, PieceKind] = {code: kind for kind, code in KIND_CODES.items()}
+
+# letters understood by Board._initialize_pieces
+_KIND_LETTERS: dict[PieceKind, str] = {
+    PieceKind.SWORDSMAN: 'S',
+    PieceKind.MAGE: 'M',
+    PieceKind.ARCHER: 'A',
+    PieceKind.GUARD: 'G',
+    PieceKind.LONGSWORD: 'L',
+    PieceKind.CRYSTAL: 'C',
+}
+
+
+def encode_piece(piece_kind: PieceKind, side: Side) -> int:
+    '''Encodes a piece kind and side into a single cell byte'''
+    return KIND_CODES[piece_kind] | (BLUE_FLAG if side == Side.BLUE else 0)
+
+
+def decode_piece(code: int) -> tuple[PieceKind, Side] | None:
+    '''Decodes a cell byte into its piece kind and side (None if empty)'''
+    if code == EMPTY:
+        return None
+    return CODE_KINDS[code & ~BLUE_FLAG], Side.BLUE if code & BLUE_FLAG else Side.RED
+
+
+class BoardLayout:
+    '''Static part of a board variant, shared by all compact positions of that variant'''
+    _layouts: dict[tuple[int, int, int, frozenset[Location]], BoardLayout] = {}
+
+    @classmethod
+    def of(cls, board: Board) -> BoardLayout:
+        key = (board.variant, board.rows, board.cols, board.impassable_terrain)
+        layout = cls._layouts.get(key)
+        if layout is None:
+            layout = cls(board)
+            cls._layouts[key] = layout
+        return layout
+
+    def __init__(self, board: Board):
+        self.rows = board.rows
+        self.cols = board.cols
+        self.variant = board.variant
+        self.impassable_terrain = board.impassable_terrain
+        self.move_table = board.move_table
+        self.walkable_mask = 0
+        for i in range(self.rows):
+            for j in range(self.cols):
+                if board.get_tile(Location(i, j)).walkable:
+                    self.walkable_mask |= 1 << (i * self.cols + j)
+
+
+class CompactBoard:
+    '''Board position backed by a flat bytearray; exposes the same queries and updates as Board'''
+    __slots__ = ('_layout', '_cells')
+
+    @classmethod
+    def from_board(cls, board: Board) -> CompactBoard:
+        layout = BoardLayout.of(board)
+        cells = bytearray(layout.rows * layout.cols)
+        for side in Side:
+            for piece in board.get_pieces(side):
+                cells[piece.location.row * layout.cols + piece.location.col] = encode_piece(piece.piece_kind, side)
+        return cls(layout, cells)
+
+    def __init__(self, layout: BoardLayout, cells: bytearray | None = None):
+        self._layout = layout
+        self._cells = cells if cells is not None else bytearray(layout.rows * layout.cols)
+
+    def to_board(self) -> Board:
+        '''Expands this position back into a regular Board'''
+        layout = self._layout
+        board = Board(layout.rows, layout.cols, layout.impassable_terrain, layout.variant)
+        initial_positions: list[list[str | None]] = [[None] * layout.cols for _ in range(layout.rows)]
+        for index, code in enumerate(self._cells):
+            decoded = decode_piece(code)
+            if decoded:
+                piece_kind, side = decoded
+                initial_positions[index // layout.cols][index % layout.cols] = ('B' if side == Side.BLUE else 'R') + _KIND_LETTERS[piece_kind]
+        board._initialize_pieces(initial_positions)
+        return board
+
+    def copy(self) -> CompactBoard:
+        return CompactBoard(self._layout, bytearray(self._cells))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompactBoard):
+            return False
+        return self._layout is other._layout and self._cells == other._cells
+
+    def __hash__(self) -> int:
+        return hash((self._layout.variant, bytes(self._cells)))
+
+    def _index(self, location: Location) -> int:
+        return location.row * self._layout.cols + location.col
+
+    def _make_piece(self, code: int, location: Location) -> Piece | None:
+        decoded = decode_piece(code)
+        if decoded is None:
+            return None
+        piece_kind, side = decoded
+        return Piece(piece_mappings[piece_kind], location, side, piece_kind == PieceKind.CRYSTAL)
+
+    def is_walkable(self, location: Location) -> bool:
+        return bool(self._layout.walkable_mask >> self._index(location) & 1)
+
+    def get_code(self, location: Location) -> int:
+        return self._cells[self._index(location)]
+
+    def get_tile(self, location: Location) -> Tile:
+        return Tile(self.get_piece(location), self.is_walkable(location))
+
+    def get_piece(self, location: Location) -> Piece | None:
+        '''Materializes the piece at a location; a new Piece object is returned on every call'''
+        return self._make_piece(self.get_code(location), location)
+
+    def place_piece(self, piece: Piece, location: Location):
+        '''Places a specific piece at a particular location (if valid)'''
+        if not self.is_valid_location(location):
+            logger.warning('cannot place a piece at an invalid location')
+            return
+        if not self.is_walkable(location):
+            logger.warning('cannot place a piece on impassable terrain')
+            return
+        if self.get_code(location) != EMPTY:
+            logger.warning('cannot place a piece on an occupied location')
+            return
+        piece.location = location
+        self._cells[self._index(location)] = encode_piece(piece.piece_kind, piece.side)
+
+    def remove_piece(self, location: Location):
+        '''Removes a piece at a specified location'''
+        if not self.is_valid_location(location):
+            logger.warning('cannot remove a piece at an invalid location')
+            return
+        self._cells[self._index(location)] = EMPTY
+
+    def is_valid_location(self, location: Location) -> bool:
+        '''Checks if a location is valid (i.e., it doesn't goes out of range)'''
+        return 0 <= location.row < self._layout.rows and 0 <= location.col < self._layout.cols
+
+    def is_valid_move(self, piece: Piece, to: Location) -> bool:
+        '''Checks if a move is valid'''
+        # location is invalid or impassable terrain
+        if not self.is_valid_location(to):
+            return False
+        index = self._index(to)
+        if not self._layout.walkable_mask >> index & 1:
+            return False
+
+        code = self._cells[index]
+        # protected pieces can only move but cannot capture/eat other pieces
+        if piece.is_protected_piece:
+            return code == EMPTY
+        if code != EMPTY:
+            # protected piece or ally piece
+            own_flag = BLUE_FLAG if piece.side == Side.BLUE else 0
+            return not ((code & ~BLUE_FLAG) == KIND_CODES[PieceKind.CRYSTAL] or (code & BLUE_FLAG) == own_flag)
+        # no target
+        return True
+
+    def get_valid_moves(self, piece: Piece) -> list[Location]:
+        '''Filters all valid moves from all possible moves'''
+        if not self.is_valid_location(piece.location):
+            return []
+        cells = self._cells
+        cols = self._layout.cols
+        destinations = self._layout.move_table[piece.piece_kind, piece.side][self._index(piece.location)]
+        if piece.is_protected_piece:
+            return [to for to in destinations if cells[to.row * cols + to.col] == EMPTY]
+        own_flag = BLUE_FLAG if piece.side == Side.BLUE else 0
+        crystal = KIND_CODES[PieceKind.CRYSTAL]
+        return [
+            to for to in destinations
+            if (code := cells[to.row * cols + to.col]) == EMPTY
+            or ((code & BLUE_FLAG) != own_flag and (code & ~BLUE_FLAG) != crystal)
+        ]
+
+    def get_valid_drops(self) -> set[Location]:
+        '''Gets all possible and valid drop locations'''
+        restricted_locations: set[Location] = set(self.impassable_terrain)
+        for crystal in self.red_crystals + self.blue_crystals:
+            restricted_locations.update(self.get_valid_moves(crystal))
+
+        cols = self._layout.cols
+        return {
+            location for index, code in enumerate(self._cells)
+            if code == EMPTY and (location := Location(index // cols, index % cols)) not in restricted_locations
+        }
+
+    def get_pieces(self, side: Side) -> list[Piece]:
+        '''Pieces of a side currently on the board'''
+        cols = self._layout.cols
+        return [
+            piece for index, code in enumerate(self._cells)
+            if code != EMPTY and (piece := self._make_piece(code, Location(index // cols, index % cols))) and piece.side == side
+        ]
+
+    def _crystals(self, side: Side) -> list[Piece]:
+        code = encode_piece(PieceKind.CRYSTAL, side)
+        cols = self._layout.cols
+        return [
+            Piece(piece_mappings[PieceKind.CRYSTAL], Location(index // cols, index % cols), side, True)
+            for index, cell in enumerate(self._cells) if cell == code
+        ]
+
+    @property
+    def red_crystals(self) -> list[Piece]:
+        return self._crystals(Side.RED)
+
+    @property
+    def blue_crystals(self) -> list[Piece]:
+        return self._crystals(Side.BLUE)
+
+    @property
+    def cells(self) -> bytearray:
+        return self._cells
+
+    @property
+    def layout(self) -> BoardLayout:
+        return self._layout
+
+    @property
+    def rows(self) -> int:
+        return self._layout.rows
+
+    @property
+    def cols(self) -> int:
+        return self._layout.cols
+
+    @property
+    def variant(self) -> int:
+        return self._layout.variant
+
+    @property
+    def impassable_terrain(self) -> frozenset[Location]:
+        return self._layout.impassable_terrain
@@ -1,16 +1,25 @@
 from model import GameModel
 from view import View, GameStateChangeObserver
-from classes import Action, Piece, Location, GameState, piece_mappings, PieceKind, Side, MessageType
+from classes import Action, Piece, PieceKind, Location, GameState, piece_mappings, MessageType
+from protocol import (WireFormat, PlayerInMessage, ConfigMessage, ActionMessage, ProtocolError, encode, decode,
+                      agreed_wire, adopted_wire)
 from cs150241project_networking import CS150241ProjectNetworking
 from typing import Optional
+import logging
 import threading
 
+logger = logging.getLogger(__name__)
+
 class GameController:
-    def __init__(self, model: GameModel, view: View):
+    def __init__(self, model: GameModel, view: View, binary_wire: bool = True):
         self._model = model
         self._view = view
         self._networking = CS150241ProjectNetworking.connect('localhost', 15000)
 
+        # actions are sent as text until both players agreed on the binary format (see protocol.py)
+        self._offered_wire = WireFormat.BINARY if binary_wire else WireFormat.TEXT
+        self._wire = WireFormat.TEXT
+
         self._send_message(MessageType.PLAYER_IN, player_id=self._networking.player_id)
        
         self._game_state_change_observers: list[GameStateChangeObserver] = []
@@ -39,57 +48,56 @@ class GameController:
         match message_type:
             case MessageType.PLAYER_IN:
                 assert player_id is not None
-                message = f'type:{message_type.value}/pid:{player_id}'
+                message = encode(PlayerInMessage(player_id, self._offered_wire))
 
             case MessageType.SEND_CONFIG:
                 assert variant is not None
-                message = f'type:{message_type.value}/variant:{variant}'
+                message = encode(ConfigMessage(variant, self._wire))
 
             case MessageType.MADE_ACTION:
                 assert action is not None
                 assert piece is not None
                 assert to is not None
-                message = f'type:{message_type.value}/moves:{self._model.state.moves_made}/action:{action.value}/pkind:{piece.piece_kind.value}/pside:{piece.side.value}/prow:{piece.location.row}/pcol:{piece.location.col}/torow:{to.row}/toloc:{to.col}'
+                message = encode(ActionMessage(self._model.state.moves_made, action, piece.piece_kind, piece.side, piece.location, to), self._wire)
 
         self._networking.send(message)
 
     def _wait_for_messages(self):
-        while True:
-            for msg in self._networking.recv():
-                self._decipher_message(msg.payload)
+        # blocks until messages arrive instead of polling
+        for msg in self._networking.messages():
+            self._decipher_message(msg.payload)
 
     def _decipher_message(self, payload: str):
-        tokens = payload.strip().split('/')
-        message_type = tokens[0].split(':')[1]
-        
-        match MessageType(int(message_type)):
-            case MessageType.PLAYER_IN:
+        try:
+            message = decode(payload)
+        except ProtocolError:
+            logger.warning(f'ignoring malformed message: {payload!r}')
+            return
+
+        match message:
+            case PlayerInMessage(pid, wire):
                 if self._networking.player_id == 1:
-                    pid = tokens[1].split(':')[1]
-                    if int(pid) == 2:
+                    if pid == 2:
+                        # Player 1 settles the action format and announces it with the board config
+                        self._wire = agreed_wire(self._offered_wire, wire)
                         self._model.p2_connected()
                         self._on_state_change(self._model.state)
 
-            case MessageType.SEND_CONFIG:
-                variant = tokens[1].split(':')[1]
-                self._model.p1_board_initializd(int(variant))
+            case ConfigMessage(variant, wire):
+                self._wire = adopted_wire(self._offered_wire, wire)
+                self._model.p1_board_initializd(variant)
                 self._on_state_change(self._model.state)
                 
-            case MessageType.MADE_ACTION:
-                moves, action, pkind, pside, prow, pcol, torow, tocol = [token.split(':')[1] for token in tokens[1:]]
-
-                self._model.state.moves_made = int(moves)
+            case ActionMessage(moves, action, piece_kind, side, src, to):
+                self._model.state.moves_made = moves
 
-                piece = Piece(piece_mappings[PieceKind(pkind)], Location(int(prow), int(pcol)), Side(int(pside)))
-                to = Location(int(torow), int(tocol))
+                # crystals are protected pieces, as when the board was set up (they cannot capture)
+                piece = Piece(piece_mappings[piece_kind], src, side, piece_kind == PieceKind.CRYSTAL)
 
-                self._perform_action(Action(int(action)), piece, to)
+                self._perform_action(action, piece, to)
 
     def _perform_action(self, action: Action, piece: Piece, to: Location):
-        self._model.next_move(action, piece, to)
-        if self._model.state.moves_made >= self._model.state.max_moves:
-            self._model.next_turn()
-        self._model.check_game_result()
+        self._model.perform_action(action, piece, to)
         self._on_state_change(self._model.state)
         
     def _on_state_change(self, game_state: GameState):
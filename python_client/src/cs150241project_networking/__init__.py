@@ -1,3 +1,4 @@
-from .main import CS150241ProjectNetworking, Message
+from .main import CS150241ProjectNetworking, Message, MESSAGE_SIZE_LIMIT, encode_batch, decode_batch, BatchError
+from .aio import AsyncCS150241ProjectNetworking
 
-__all__ = ['CS150241ProjectNetworking', 'Message']
+__all__ = ['CS150241ProjectNetworking', 'AsyncCS150241ProjectNetworking', 'Message', 'MESSAGE_SIZE_LIMIT', 'encode_batch', 'decode_batch', 'BatchError']
@@ -0,0 +1,155 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+from typing import AsyncIterator
+from websockets import ConnectionClosed
+from websockets.asyncio.client import connect, ClientConnection
+import logging
+
+from .main import Message, PlayerId, coalesce, unbatch
+
+
+'''
+asyncio counterpart of CS150241ProjectNetworking: the same connect/send/recv/player_id surface, but the
+send and recv loops are tasks on the running event loop instead of two OS threads per connection, so
+one process can hold hundreds of connections.
+'''
+logger = logging.getLogger(__name__)
+
+
+class AsyncCS150241ProjectNetworking:
+    @classmethod
+    async def connect(cls, ip_addr: str, port: int, coalesce: bool = False) -> AsyncCS150241ProjectNetworking:
+        '''Connects to the server and starts the send and recv tasks (see CS150241ProjectNetworking.connect)'''
+        websocket = await connect(f"ws://{ip_addr}:{port}")
+
+        logger.debug("Waiting for initial PID message")
+        raw = await websocket.recv()
+        message = Message.from_raw(str(raw))
+        logger.debug("Received initial PID message")
+
+        ret = AsyncCS150241ProjectNetworking(websocket, message.source, coalesce)
+        ret.start()
+
+        return ret
+
+    def __init__(self, websocket: ClientConnection, player_id: PlayerId, coalesce: bool = False):
+        self._websocket = websocket
+        self._player_id = player_id
+        self._coalesce = coalesce
+
+        self._send_queue: list[Message] = []
+        self._recv_queue: deque[Message] = deque()
+
+        self._send_ready = asyncio.Event()
+        self._recv_condvar = asyncio.Condition()
+
+        self._exit_signal = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    @property
+    def player_id(self):
+        return self._player_id
+
+    @property
+    def is_closed(self) -> bool:
+        return self._exit_signal.is_set()
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._recv_loop()),
+        ]
+
+    async def close(self):
+        await self._websocket.close()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def send(self, payload: str) -> None:
+        '''Queues a payload; it is sent by the send task in the order send was called'''
+        message = Message(source=self.player_id, payload=payload)
+        logger.info(f"Queueing for sending: {message}")
+        self._send_queue.append(message)
+        self._send_ready.set()
+
+    async def recv(self, timeout: float | None = 0) -> AsyncIterator[Message]:
+        '''Yields the messages received so far, waiting like CS150241ProjectNetworking.recv'''
+        batch = await self.recv_batch(timeout)
+        try:
+            while batch:
+                yield batch.popleft()
+        finally:
+            # the caller stopped early: keep the rest for the next recv
+            if batch:
+                batch.extend(self._recv_queue)
+                self._recv_queue = batch
+
+    async def recv_batch(self, timeout: float | None = 0) -> deque[Message]:
+        '''Takes every queued message at once; empty if none arrived in time'''
+        if timeout != 0:
+            async with self._recv_condvar:
+                try:
+                    async with asyncio.timeout(timeout):
+                        await self._recv_condvar.wait_for(lambda: len(self._recv_queue) > 0
+                                                          or self._exit_signal.is_set())
+                except TimeoutError:
+                    pass
+
+        batch, self._recv_queue = self._recv_queue, deque()
+        return batch
+
+    async def messages(self) -> AsyncIterator[Message]:
+        '''Waits for and yields every message until the connection is closed'''
+        while not self._exit_signal.is_set():
+            async for message in self.recv(timeout=None):
+                yield message
+        # messages that arrived right before the connection closed
+        async for message in self.recv():
+            yield message
+
+    async def _close_all_tasks(self) -> None:
+        self._exit_signal.set()
+        self._send_ready.set()
+        async with self._recv_condvar:
+            self._recv_condvar.notify_all()
+
+    async def _recv_loop(self) -> None:
+        try:
+            async for raw in self._websocket:
+                messages = unbatch(Message.from_raw(str(raw)))
+
+                logger.info(f"Queueing into recv queue: {messages}")
+
+                async with self._recv_condvar:
+                    self._recv_queue.extend(messages)
+                    self._recv_condvar.notify_all()
+        except ConnectionClosed:
+            pass
+        finally:
+            # whatever ended the loop, wake up recv/messages instead of leaving them waiting forever
+            logger.info("Recv loop is done")
+            await self._close_all_tasks()
+
+    async def _send_loop(self) -> None:
+        while not self._exit_signal.is_set():
+            await self._send_ready.wait()
+            self._send_ready.clear()
+
+            if self._exit_signal.is_set():
+                logger.info("Send loop is exiting due to exit signal")
+                break
+
+            pending, self._send_queue = self._send_queue, []
+            payloads = [message.as_sendable() for message in pending]
+            frames = coalesce(payloads) if self._coalesce else payloads
+
+            try:
+                for frame in frames:
+                    logger.info(f"Sending: {frame}")
+                    await self._websocket.send(frame)
+            except ConnectionClosed:
+                logger.info("Connection closed; ending send loop")
+                await self._close_all_tasks()
+                break
+
+        logger.info("Send loop is done")
@@ -1,8 +1,9 @@
 from __future__ import annotations
 import threading
+from collections import deque
 from websockets import ConnectionClosed
 from websockets.sync.client import connect, ClientConnection
-from typing import NewType, Generator
+from typing import NewType, Generator, Iterator
 from dataclasses import dataclass
 import logging
 
@@ -11,6 +12,12 @@ logger = logging.getLogger()
 
 PlayerId = NewType('PlayerId', int)
 
+# the server closes connections that send frames larger than this (in bytes)
+MESSAGE_SIZE_LIMIT = 202
+
+# a frame holding several payloads: BATCH_MARKER, then <length>:<payload> for each payload
+BATCH_MARKER = '\x1e'
+
 
 def thread_id_filter(record: logging.LogRecord) -> logging.LogRecord:
     record.thread_id = threading.get_native_id()
@@ -34,9 +41,72 @@ class Message:
         return self.payload
 
 
+def encode_batch(payloads: list[str]) -> str:
+    '''Packs payloads into one frame; a single payload is sent as is unless it could be mistaken for a batch'''
+    if len(payloads) == 1 and not payloads[0].startswith(BATCH_MARKER):
+        return payloads[0]
+    return BATCH_MARKER + ''.join(f'{len(payload)}:{payload}' for payload in payloads)
+
+
+class BatchError(ValueError):
+    pass
+
+
+def decode_batch(frame: str) -> list[str]:
+    '''
+    Payloads of a frame made by encode_batch (a frame without BATCH_MARKER is a single payload)
+    Raises BatchError if a length is missing or does not fit in the frame
+    '''
+    if not frame.startswith(BATCH_MARKER):
+        return [frame]
+
+    payloads: list[str] = []
+    start = len(BATCH_MARKER)
+    while start < len(frame):
+        separator = frame.find(':', start)
+        length = frame[start:separator]
+        if separator < 0 or not (length.isascii() and length.isdigit()):
+            raise BatchError(f'missing payload length at {start} in batch frame {frame!r}')
+        end = separator + 1 + int(length)
+        if end > len(frame):
+            raise BatchError(f'payload length {length} goes past the end of batch frame {frame!r}')
+        payloads.append(frame[separator + 1:end])
+        start = end
+    return payloads
+
+
+def unbatch(frame: Message) -> list[Message]:
+    '''Messages of a received frame; a malformed batch is logged and delivered as a single payload'''
+    try:
+        payloads = decode_batch(frame.payload)
+    except BatchError as e:
+        logger.warning(f"Delivering malformed batch frame as is: {e}")
+        payloads = [frame.payload]
+    return [Message(source=frame.source, payload=payload) for payload in payloads]
+
+
+def coalesce(payloads: list[str], max_size: int = MESSAGE_SIZE_LIMIT) -> Iterator[str]:
+    '''Groups consecutive payloads into as few frames of at most max_size bytes as possible, keeping their order'''
+    group: list[str] = []
+    size = len(BATCH_MARKER)
+    for payload in payloads:
+        entry_size = len(f'{len(payload)}:{payload}'.encode())
+        if group and size + entry_size > max_size:
+            yield encode_batch(group)
+            group, size = [], len(BATCH_MARKER)
+        group.append(payload)
+        size += entry_size
+    if group:
+        yield encode_batch(group)
+
+
 class CS150241ProjectNetworking:
     @classmethod
-    def connect(cls, ip_addr: str, port: int) -> CS150241ProjectNetworking:
+    def connect(cls, ip_addr: str, port: int, coalesce: bool = False) -> CS150241ProjectNetworking:
+        '''
+        Connects to the server and starts the send and recv threads
+        With coalesce, payloads queued together are sent in shared frames (the other client must use this version)
+        '''
         websocket = connect(f"ws://{ip_addr}:{port}")
 
         logger.debug("Waiting for initial PID message")
@@ -45,17 +115,18 @@ class CS150241ProjectNetworking:
         logger.debug("Received initial PID message")
         player_id = message.source
 
-        ret = CS150241ProjectNetworking(websocket, player_id)
+        ret = CS150241ProjectNetworking(websocket, player_id, coalesce)
         ret.start()
 
         return ret
 
-    def __init__(self, websocket: ClientConnection, player_id: PlayerId):
+    def __init__(self, websocket: ClientConnection, player_id: PlayerId, coalesce: bool = False):
         self._websocket = websocket
         self._player_id = player_id
+        self._coalesce = coalesce
 
         self._send_queue: list[Message] = []
-        self._recv_queue: list[Message] = []
+        self._recv_queue: deque[Message] = deque()
 
         self._send_condvar = threading.Condition()
         self._recv_condvar = threading.Condition()
@@ -66,6 +137,10 @@ class CS150241ProjectNetworking:
     def player_id(self):
         return self._player_id
 
+    @property
+    def is_closed(self) -> bool:
+        return self._exit_signal.is_set()
+
     def start(self):
         t1 = threading.Thread(target=self._sync_send_loop, daemon=True)
         t2 = threading.Thread(target=self._sync_recv_loop, daemon=True)
@@ -83,15 +158,43 @@ class CS150241ProjectNetworking:
             self._send_queue.append(message)
             self._send_condvar.notify_all()
 
-    def recv(self) -> Generator[Message, None, None]:
+    def recv(self, timeout: float | None = 0) -> Generator[Message, None, None]:
+        '''
+        Yields the messages received so far, waiting up to timeout seconds for at least one
+        timeout=0 (the default) does not wait, timeout=None waits until a message arrives or the connection closes
+        '''
+        batch = self.recv_batch(timeout)
+        try:
+            while batch:
+                message = batch.popleft()
+                logging.info(f"Popping from recv queue: {message}")
+                yield message
+        finally:
+            # the caller stopped early: keep the rest for the next recv
+            if batch:
+                with self._recv_condvar:
+                    batch.extend(self._recv_queue)
+                    self._recv_queue = batch
+
+    def recv_batch(self, timeout: float | None = 0) -> deque[Message]:
+        '''Takes every queued message at once (same waiting rules as recv); empty if none arrived in time'''
         logger.debug("Trying to acquire recv lock (recv)")
         with self._recv_condvar:
-            logger.debug("Acquired recv lock (recv); yielding recv queue data")
+            logger.debug("Acquired recv lock (recv); taking recv queue data")
 
-            while self._recv_queue:
-                message = self._recv_queue.pop(0)
-                logging.info(f"Popping from recv queue: {message}")
-                yield message
+            if timeout != 0:
+                self._recv_condvar.wait_for(lambda: len(self._recv_queue) > 0
+                                            or self._exit_signal.is_set(), timeout)
+
+            batch, self._recv_queue = self._recv_queue, deque()
+        return batch
+
+    def messages(self) -> Iterator[Message]:
+        '''Blocks for and yields every message until the connection is closed'''
+        while not self._exit_signal.is_set():
+            yield from self.recv(timeout=None)
+        # messages that arrived right before the connection closed
+        yield from self.recv()
 
     def _close_all_threads(self) -> None:
         self._exit_signal.set()
@@ -103,33 +206,35 @@ class CS150241ProjectNetworking:
         else:
             logging.debug("Failed to notify all waiting on send condvar")
 
-        if self._recv_condvar.acquire(blocking=False):
+        # recv may be blocked on the condvar with no timeout, so this notification must not be skipped
+        # (the lock is never held for long since messages are yielded outside of it)
+        with self._recv_condvar:
             logging.debug("Notifying all waiting on recv condvar")
             self._recv_condvar.notify_all()
-            self._recv_condvar.release()
-        else:
-            logging.debug("Failed to notify all waiting on recv condvar")
 
     def _sync_recv_loop(self) -> None:
         logger.debug('Thread: _sync_recv_loop')
 
-        while not self._exit_signal.is_set():
-            logger.debug("Trying to recv from websocket (_sync_recv_loop)")
+        try:
+            while not self._exit_signal.is_set():
+                logger.debug("Trying to recv from websocket (_sync_recv_loop)")
 
-            try:
-                raw = self._websocket.recv()
-            except ConnectionClosed:
-                logger.info("Connection closed; ending recv loop")
-                self._close_all_threads()
-                break
+                try:
+                    raw = self._websocket.recv()
+                except ConnectionClosed:
+                    logger.info("Connection closed; ending recv loop")
+                    break
 
-            message = Message.from_raw(str(raw))
+                messages = unbatch(Message.from_raw(str(raw)))
 
-            logging.info(f"Queueing into recv queue: {message}")
+                logging.info(f"Queueing into recv queue: {messages}")
 
-            with self._recv_condvar:
-                self._recv_queue.append(message)
-                self._recv_condvar.notify_all()
+                with self._recv_condvar:
+                    self._recv_queue.extend(messages)
+                    self._recv_condvar.notify_all()
+        finally:
+            # whatever ended the loop, wake up recv/messages instead of leaving them blocked forever
+            self._close_all_threads()
 
         logger.info("Recv loop is done")
 
@@ -150,19 +255,25 @@ class CS150241ProjectNetworking:
                     logger.info("Send loop is exiting due to exit signal")
                     break
 
-                logger.debug("send queue data found; will process")
+                # take the whole queue so that send can keep queueing while this thread is busy with the socket
+                pending, self._send_queue = self._send_queue, []
+
+            logger.debug("send queue data found; will process")
 
-                while self._send_queue:
-                    message = self._send_queue.pop()
-                    logging.info(f"Sending: {message}")
+            payloads = [message.as_sendable() for message in pending]
+            frames = coalesce(payloads) if self._coalesce else payloads
 
-                    try:
-                        self._websocket.send(message.as_sendable())
-                    except ConnectionClosed:
-                        logger.info("Connection closed; ending send loop")
-                        self._close_all_threads()
-                        is_send_loop_running = False
-                        break
+            # oldest first, so that the actions of a turn arrive in the order they were made
+            for frame in frames:
+                logging.info(f"Sending: {frame}")
+
+                try:
+                    self._websocket.send(frame)
+                except ConnectionClosed:
+                    logger.info("Connection closed; ending send loop")
+                    self._close_all_threads()
+                    is_send_loop_running = False
+                    break
 
         logger.info("Send loop is done")
 
@@ -184,7 +295,7 @@ if __name__ == "__main__":
     networking.send("PAYLOAD 3")
 
     print('Client calling recv...')
-    for m in networking.recv():
+    for m in networking.recv(timeout=1.0):
         print('Client recv loop:', m)
 
     print('Client done')
@@ -0,0 +1,125 @@
+'''
+Headless rules engine: create, inspect and play games without pygame or networking.
+
+Only classes.py and model.py are imported, so this module can be used by servers, bots and
+simulations that have no display. Actions are applied through GameModel.perform_action, the same
+path the controller uses for actions received from the network.
+
+A game action is a tuple (Action, PieceKind, from, to), where from is None for drops.
+'''
+from typing import Iterator
+from classes import GameState, Action, PieceKind, Piece, Location, GameVerdict, piece_mappings
+from compactboard import CompactBoard
+from model import GameModel, UndoRecord
+
+GameAction = tuple[Action, PieceKind, Location | None, Location]
+
+
+def new_state(variant: int) -> GameState:
+    '''Creates a fresh game of the given board variant (see GameState.new_board)'''
+    return GameState.new_board(variant)
+
+
+def clone_state(state: GameState) -> GameState:
+    '''Independent copy of a game (board, stored pieces, turn and verdict) that can be played on freely'''
+    clone = GameState(CompactBoard.from_board(state.board).to_board(), state.max_moves)
+    for player, clone_player in ((state.red_player, clone.red_player), (state.blue_player, clone.blue_player)):
+        for piece_kind, stored in player.stored_pieces.items():
+            for _ in stored:
+                clone_player.capture_piece(Piece(piece_mappings[piece_kind], Location(-1, -1), player.side))
+    clone.curr_player = clone.red_player if state.curr_player is state.red_player else clone.blue_player
+    clone.moves_made = state.moves_made
+    clone.game_verdict = state.game_verdict
+    return clone
+
+
+def legal_actions(state: GameState) -> Iterator[GameAction]:
+    '''
+    Yields every action the current player can make: moves piece by piece, then drops
+    Drops are yielded once per stored piece kind, however many pieces of that kind are stored
+    The board must not change while the generator is being consumed
+    '''
+    if state.game_verdict != GameVerdict.CONTINUE:
+        return
+
+    board = state.board
+    for piece in tuple(board.get_pieces(state.curr_player.side)):
+        src = piece.location
+        piece_kind = piece.piece_kind
+        for to in board.get_valid_moves(piece):
+            yield Action.MOVE, piece_kind, src, to
+
+    droppable = [piece_kind for piece_kind, stored in state.curr_player.stored_pieces.items() if stored]
+    if droppable:
+        drops = board.get_valid_drops()
+        for piece_kind in droppable:
+            for to in drops:
+                yield Action.DROP, piece_kind, None, to
+
+
+def count_legal_actions(state: GameState) -> int:
+    '''Number of actions legal_actions would yield, without building them'''
+    if state.game_verdict != GameVerdict.CONTINUE:
+        return 0
+
+    board = state.board
+    count = sum(len(board.get_valid_moves(piece)) for piece in board.get_pieces(state.curr_player.side))
+    droppable = sum(1 for stored in state.curr_player.stored_pieces.values() if stored)
+    if droppable:
+        count += droppable * len(board.get_valid_drops())
+    return count
+
+
+def is_legal_action(state: GameState, game_action: GameAction) -> bool:
+    '''Checks an action against the current player, the board and the stored pieces'''
+    if state.game_verdict != GameVerdict.CONTINUE:
+        return False
+
+    action, piece_kind, src, to = game_action
+    board = state.board
+    player = state.curr_player
+    match action:
+        case Action.MOVE:
+            if src is None or not board.is_valid_location(src):
+                return False
+            piece = board.get_piece(src)
+            if piece is None or piece.side != player.side or piece.piece_kind != piece_kind:
+                return False
+            return to in board.get_valid_moves(piece)
+        case Action.DROP:
+            if piece_kind not in player.stored_pieces or not player.stored_pieces[piece_kind]:
+                return False
+            return to in board.get_valid_drops()
+    return False
+
+
+def make_piece(state: GameState, game_action: GameAction) -> Piece:
+    '''The piece GameModel.next_move expects for an action: the board piece for moves, a new piece for drops'''
+    action, piece_kind, src, _ = game_action
+    if action == Action.MOVE:
+        assert src is not None
+        piece = state.board.get_piece(src)
+        assert piece is not None
+        return piece
+    return Piece(piece_mappings[piece_kind], Location(-1, -1), state.curr_player.side)
+
+
+def apply_action(state: GameState, game_action: GameAction) -> GameVerdict:
+    '''Plays a (legal) action for the current player and returns the resulting verdict'''
+    action, _, _, to = game_action
+    return GameModel(state).perform_action(action, make_piece(state, game_action), to)
+
+
+def make_action(state: GameState, game_action: GameAction) -> UndoRecord:
+    '''Like apply_action, but returns a record for undo_action'''
+    action, _, _, to = game_action
+    return GameModel(state).apply(action, make_piece(state, game_action), to)
+
+
+def undo_action(state: GameState, record: UndoRecord):
+    '''Takes back an action made with make_action (in reverse order of making them)'''
+    GameModel(state).undo(record)
+
+
+def get_verdict(state: GameState) -> GameVerdict:
+    return state.game_verdict
@@ -0,0 +1,21 @@
+from classes import PieceKind
+
+
+'''
+Weights of the static evaluation: material on the board and in store, plus crystal mobility.
+
+Shared by the AI search (AIPlayer.evaluate) and the batch analytics (PositionBatch.scores), so both
+always score a position the same way.
+'''
+
+MATERIAL_WEIGHT = 10
+CRYSTAL_MOBILITY_WEIGHT = 4
+
+PIECE_VALUES: dict[PieceKind, int] = {
+    PieceKind.SWORDSMAN: 1,
+    PieceKind.GUARD: 2,
+    PieceKind.LONGSWORD: 3,
+    PieceKind.ARCHER: 3,
+    PieceKind.MAGE: 5,
+    PieceKind.CRYSTAL: 0,
+}
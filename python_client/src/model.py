@@ -1,7 +1,24 @@
-from classes import (GameState, ClassicBoard, Action, Piece, Location, GameVerdict)
+from classes import (GameState, ClassicBoard, Action, Piece, Location, GameVerdict, Player, Side)
+from dataclasses import dataclass
 from typing import Self
 
 
+@dataclass
+class UndoRecord:
+    '''Everything GameModel.undo needs to take back one GameModel.apply'''
+    action: Action
+    piece: Piece
+    src: Location                   # location of the piece before the action
+    to: Location
+    player: Player                  # player who made the action
+    captured: Piece | None          # piece taken by a MOVE
+    captured_side: Side | None      # side of the taken piece before it was captured
+    used_piece: Piece | None        # stored piece used up by a DROP
+    moves_made: int
+    curr_player: Player
+    game_verdict: GameVerdict
+
+
 class GameModel:
     @classmethod
     def default_game(cls) -> Self:
@@ -37,16 +54,66 @@ class GameModel:
 
         self._state.moves_made += 1
         
+    def perform_action(self, action: Action, piece: Piece, to: Location) -> GameVerdict:
+        '''Plays one action, ends the turn once max_moves actions were made and updates the verdict'''
+        self.next_move(action, piece, to)
+        if self._state.moves_made >= self._state.max_moves:
+            self.next_turn()
+        self.check_game_result()
+        return self._state.game_verdict
+
+    def apply(self, action: Action, piece: Piece, to: Location) -> UndoRecord:
+        '''Same as perform_action, but returns a record that undo can use to restore the previous state'''
+        state = self._state
+        record = UndoRecord(action, piece, piece.location, to, state.curr_player, None, None, None,
+                            state.moves_made, state.curr_player, state.game_verdict)
+        if state.moves_made >= state.max_moves:
+            self.next_turn()
+            record.player = state.curr_player
+
+        match action:
+            case Action.MOVE:
+                record.captured = state.board.get_piece(to)
+                if record.captured:
+                    record.captured_side = record.captured.side
+            case Action.DROP:
+                stored = state.curr_player.stored_pieces[piece.piece_kind]
+                record.used_piece = stored[-1] if stored else None
+
+        self.perform_action(action, piece, to)
+        return record
+
+    def undo(self, record: UndoRecord):
+        '''Takes back an action made with apply; records must be undone in reverse order'''
+        state = self._state
+        board = state.board
+        board.remove_piece(record.to)
+
+        match record.action:
+            case Action.MOVE:
+                board.place_piece(record.piece, record.src)
+                if record.captured:
+                    record.player.undo_capture(record.captured.piece_kind)
+                    assert record.captured_side is not None
+                    record.captured.side = record.captured_side
+                    board.place_piece(record.captured, record.to)
+            case Action.DROP:
+                record.piece.location = record.src
+                if record.used_piece:
+                    record.player.undo_use(record.used_piece)
+
+        state.moves_made = record.moves_made
+        state.curr_player = record.curr_player
+        state.game_verdict = record.game_verdict
+
     def next_turn(self):
         self._state.curr_player = self._state.red_player if self._state.curr_player == self._state.blue_player else self._state.blue_player
         self._state.moves_made = 0
         
     def check_game_result(self):
-        valid_moves_for_blue_crystals = [len(self._state.board.get_valid_moves(crystal)) for crystal in self._state.board.blue_crystals]
-        valid_moves_for_red_crystals = [len(self._state.board.get_valid_moves(crystal)) for crystal in self._state.board.red_crystals]
-
-        can_blue_still_move = any(valid_moves_for_blue_crystals)
-        can_red_still_move = any(valid_moves_for_red_crystals)
+        # crystal mobility is kept up to date by the board as pieces are placed and removed
+        can_blue_still_move = self._state.board.get_crystal_mobility(Side.BLUE) > 0
+        can_red_still_move = self._state.board.get_crystal_mobility(Side.RED) > 0
 
         if not can_blue_still_move and not can_red_still_move:
             self._state.game_verdict = GameVerdict.DRAW
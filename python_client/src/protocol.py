@@ -0,0 +1,146 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from enum import StrEnum
+import base64
+import binascii
+import struct
+from classes import Action, PieceKind, Side, Location, MessageType
+
+
+'''
+Controller messages and their two wire formats.
+
+The text format is the original one, `key:value` pairs separated by slashes:
+    type:1/pid:2
+    type:2/variant:4
+    type:3/moves:0/action:1/pkind:Guard/pside:2/prow:7/pcol:3/torow:6/toloc:3
+
+The binary format packs MADE_ACTION into a fixed 9-byte struct. The server relays text frames, so the
+struct is sent base64-encoded after BINARY_MARKER (13 characters instead of about 80).
+
+Binary actions are only sent once both players agreed on them. Each client offers it by appending
+`/wire:bin` to its PLAYER_IN message. Player 1 sees the PLAYER_IN of Player 2 and repeats the outcome in
+its SEND_CONFIG message, which both clients receive. Clients without binary support ignore the extra
+token and keep using text. decode accepts both formats at any time.
+'''
+
+BINARY_MARKER = '#'
+
+# type, moves made, action, piece kind code, side, from row, from col, to row, to col
+ACTION_STRUCT = struct.Struct('<BBBBBbbbb')
+
+# piece kind codes of the binary format; part of the wire format, so they never change with the board storage
+WIRE_KIND_CODES: dict[PieceKind, int] = {
+    PieceKind.SWORDSMAN: 1,
+    PieceKind.MAGE: 2,
+    PieceKind.ARCHER: 3,
+    PieceKind.GUARD: 4,
+    PieceKind.LONGSWORD: 5,
+    PieceKind.CRYSTAL: 6,
+}
+WIRE_CODE_KINDS: dict[int, PieceKind] = {code: kind for kind, code in WIRE_KIND_CODES.items()}
+
+
+class WireFormat(StrEnum):
+    TEXT = 'text'
+    BINARY = 'bin'
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class PlayerInMessage:
+    player_id: int
+    wire: WireFormat = WireFormat.TEXT          # best format the sender understands
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigMessage:
+    variant: int
+    wire: WireFormat = WireFormat.TEXT          # format both players use for actions
+
+
+@dataclass(frozen=True, slots=True)
+class ActionMessage:
+    moves: int
+    action: Action
+    piece_kind: PieceKind
+    side: Side
+    src: Location
+    to: Location
+
+
+ControllerMessage = PlayerInMessage | ConfigMessage | ActionMessage
+
+
+def encode(message: ControllerMessage, wire: WireFormat = WireFormat.TEXT) -> str:
+    '''Encodes a message; only actions have a binary form, the handshake is always text'''
+    match message:
+        case PlayerInMessage(player_id, offered):
+            text = f'type:{MessageType.PLAYER_IN.value}/pid:{player_id}'
+            return text + f'/wire:{offered}' if offered == WireFormat.BINARY else text
+
+        case ConfigMessage(variant, agreed):
+            text = f'type:{MessageType.SEND_CONFIG.value}/variant:{variant}'
+            return text + f'/wire:{agreed}' if agreed == WireFormat.BINARY else text
+
+        case ActionMessage(moves, action, piece_kind, side, src, to):
+            if wire == WireFormat.BINARY:
+                packed = ACTION_STRUCT.pack(MessageType.MADE_ACTION.value, moves, action.value, WIRE_KIND_CODES[piece_kind],
+                                            side.value, src.row, src.col, to.row, to.col)
+                return BINARY_MARKER + base64.b64encode(packed).decode('ascii')
+            return (f'type:{MessageType.MADE_ACTION.value}/moves:{moves}/action:{action.value}/pkind:{piece_kind.value}'
+                    f'/pside:{side.value}/prow:{src.row}/pcol:{src.col}/torow:{to.row}/toloc:{to.col}')
+
+
+def agreed_wire(offered: WireFormat, peer_offered: WireFormat) -> WireFormat:
+    '''Format Player 1 picks from its own offer and the one in the PLAYER_IN of Player 2'''
+    both_binary = offered == WireFormat.BINARY and peer_offered == WireFormat.BINARY
+    return WireFormat.BINARY if both_binary else WireFormat.TEXT
+
+
+def adopted_wire(offered: WireFormat, announced: WireFormat) -> WireFormat:
+    '''Format a client uses once it receives the SEND_CONFIG of Player 1; text unless it offered binary itself'''
+    return announced if offered == WireFormat.BINARY else WireFormat.TEXT
+
+
+def decode(payload: str) -> ControllerMessage:
+    '''Decodes a message in either wire format; raises ProtocolError if it is malformed'''
+    payload = payload.strip()
+    try:
+        if payload.startswith(BINARY_MARKER):
+            return _decode_binary(payload)
+        return _decode_text(payload)
+    except ProtocolError:
+        raise
+    except (KeyError, ValueError, IndexError, struct.error, binascii.Error) as e:
+        raise ProtocolError(f'malformed message {payload!r}') from e
+
+
+def _decode_binary(payload: str) -> ActionMessage:
+    packed = base64.b64decode(payload[len(BINARY_MARKER):], validate=True)
+    message_type, moves, action, kind_code, side, prow, pcol, torow, tocol = ACTION_STRUCT.unpack(packed)
+    if message_type != MessageType.MADE_ACTION:
+        raise ProtocolError(f'unexpected binary message type {message_type}')
+    return ActionMessage(moves, Action(action), WIRE_CODE_KINDS[kind_code], Side(side), Location(prow, pcol), Location(torow, tocol))
+
+
+def _decode_text(payload: str) -> ControllerMessage:
+    fields = dict(token.split(':', 1) for token in payload.split('/'))
+    wire = WireFormat(fields['wire']) if fields.get('wire') in tuple(WireFormat) else WireFormat.TEXT
+    match MessageType(int(fields['type'])):
+        case MessageType.PLAYER_IN:
+            return PlayerInMessage(int(fields['pid']), wire)
+        case MessageType.SEND_CONFIG:
+            return ConfigMessage(int(fields['variant']), wire)
+        case MessageType.MADE_ACTION:
+            return ActionMessage(
+                int(fields['moves']),
+                Action(int(fields['action'])),
+                PieceKind(fields['pkind']),
+                Side(int(fields['pside'])),
+                Location(int(fields['prow']), int(fields['pcol'])),
+                Location(int(fields['torow']), int(fields['toloc'])),
+            )
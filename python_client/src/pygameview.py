@@ -1,4 +1,6 @@
 from enum import StrEnum
+from functools import cache, lru_cache
+from typing import AbstractSet
 from classes import GameState, Location, Piece, PieceKind, Side, Action, GameVerdict, piece_mappings
 from view import ActionObserver, NewGameObserver
 from sprites import datasprites, boardtextures
@@ -7,6 +9,9 @@ import pygame
 #CONSTANTS
 TILESET_PATH = "src/assets/assets.png"
 TILE_SIZE = 32 
+STATE_CHANGED_EVENT = pygame.USEREVENT + 1   # posted by on_state_change, possibly from the network thread
+IDLE_WAIT_MS = 1000                          # longest an event-driven view sleeps without redrawing
+TEXT_CACHE_SIZE = 256                        # rendered text surfaces kept by render_text
 
 
 class ScreenState(StrEnum):
@@ -18,6 +23,18 @@ GRAY = (169, 169, 169)
 HOVER_COLOR = (200, 200, 200)
 
 
+@cache
+def get_font(path: str, size: int) -> pygame.font.Font:
+    '''Loads a font file once per (path, size)'''
+    return pygame.font.Font(path, size)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(font: pygame.font.Font, text: str, color: str | tuple[int, int, int]) -> pygame.Surface:
+    '''Renders antialiased text, reusing the surface of recently rendered (font, text, color)'''
+    return font.render(text, True, color)
+
+
 class Button:
     def __init__(self, x: int, y: int, width: int, height: int, text: str):
         self.rect = pygame.Rect(x, y, width, height)
@@ -25,9 +42,9 @@ class Button:
         self.color = GRAY
 
     def draw(self, screen: pygame.Surface):
-        button_font = pygame.font.Font("src/assets/kongtext.ttf", 16)
+        button_font = get_font("src/assets/kongtext.ttf", 16)
         pygame.draw.rect(screen, self.color, self.rect, border_radius=5)
-        text_surf = button_font.render(self.text, True, "black")
+        text_surf = render_text(button_font, self.text, "black")
         screen.blit(text_surf, (self.rect.x + (self.rect.width - text_surf.get_width()) // 2, 
                                self.rect.y + (self.rect.height - text_surf.get_height()) // 2))
 
@@ -36,7 +53,10 @@ class Button:
 
 
 class GameView:
-    def __init__(self, state: GameState):
+    def __init__(self, state: GameState, event_driven: bool = True):
+        # event_driven: redraw only on input, state changes and hover changes instead of every tick
+        self.event_driven = event_driven
+        self._hover_target: Location | str | None = None
         self.pygame_init()
         self.assets: pygame.Surface = pygame.image.load(TILESET_PATH).convert_alpha()
         self.select_mode: Action | None = None
@@ -47,6 +67,24 @@ class GameView:
         self.menu_buttons: dict[str, Button] = {}
         self.screen_state: ScreenState = ScreenState.MENU   
 
+        # highlight colors per location, reused across frames until the selection or state changes
+        # on_state_change runs on the network thread, so the cache is keyed by a state generation counter:
+        # highlights computed while the state changed are stored under the old generation and never reused
+        self._state_generation = 0
+        self._highlights: dict[Location, str] = {}
+        self._highlights_key: tuple[int, Action | None, Piece | None, tuple[PieceKind, Side] | None] | None = None
+
+        # scaled sprites keyed by (sprite name, size, opacity), cleared on resize and variant change
+        self._sprite_cache: dict[tuple[str, int, int], pygame.Surface] = {}
+        self._sprite_cache_variant: int | None = None
+
+        # terrain never changes within a game, so it is rendered once and pieces are composited over it
+        self._terrain_layer: pygame.Surface | None = None
+        self._terrain_layer_key: tuple[int, int] | None = None
+        # what was last drawn on each tile (highlight, piece texture) and on the rest of the screen
+        self._drawn_tiles: dict[Location, tuple[str, str]] = {}
+        self._frame_signature: tuple | None = None
+
         self.on_state_change(state)
         
         #initialize observers here
@@ -65,6 +103,14 @@ class GameView:
         self.nid = state.network_id
         self.P2_connected = state.is_P2_connected
         self.P1_chosen_variant = state.P1board_variant
+
+        self._state_generation += 1
+        if self._sprite_cache_variant != self.board.variant:
+            self.invalidate_sprite_cache()
+            self._sprite_cache_variant = self.board.variant
+
+        # wake up the render loop
+        pygame.event.post(pygame.event.Event(STATE_CHANGED_EVENT))
     
     @property
     def assigned_player_side(self):
@@ -81,19 +127,20 @@ class GameView:
         return locations
     
     @property
-    def valid_drop_locations(self) -> list[Location]:
+    def valid_drop_locations(self) -> AbstractSet[Location]:
         if self.selected_piece_to_drop:
             piecekind, side = self.selected_piece_to_drop
         
             match side:
                 case Side.RED:
                     if len(self.red_dict[piecekind]) == 0:
-                        return []
+                        return set()
                 case Side.BLUE:
                     if len(self.blue_dict[piecekind]) == 0:
-                        return []
-            return self.board.get_valid_drops()
-        else: return []
+                        return set()
+            # a snapshot: the board's live set is changed by the network thread while the view iterates it
+            return set(self.board.get_valid_drops())
+        else: return set()
 
     # Calculate tile size dynamically based on the zoom factor and screen dimensions
     @property
@@ -126,6 +173,19 @@ class GameView:
         sprite.set_alpha(opacity)  
         return sprite
 
+    def get_scaled_sprite(self, name: str, size: int, opacity: int = 255) -> pygame.Surface:
+        '''Gets a sprite from "datasprites" scaled to size x size, scaling it only on first use'''
+        key = (name, size, opacity)
+        sprite = self._sprite_cache.get(key)
+        if sprite is None:
+            sprite = pygame.transform.scale(self.get_sprite(*datasprites[name]), (size, size))
+            sprite.set_alpha(opacity)
+            self._sprite_cache[key] = sprite
+        return sprite
+
+    def invalidate_sprite_cache(self):
+        self._sprite_cache.clear()
+
     def get_tile_texture(self, row: int, col: int) -> str:
         variant = boardtextures[self.board.variant] # change depending how variants is initialized
         return variant[row][col] 
@@ -153,29 +213,39 @@ class GameView:
         texture = side + '_' + kind
         return texture
 
-    def get_highlight_texture(self, location: Location) -> str:        
-        color = ""
+    @property
+    def highlights(self) -> dict[Location, str]:
+        key = (self._state_generation, self.select_mode, self.selected_piece_to_move, self.selected_piece_to_drop)
+        if self._highlights_key != key:
+            self._highlights = self.compute_highlights()
+            self._highlights_key = key
+        return self._highlights
+
+    def compute_highlights(self) -> dict[Location, str]:
+        highlights: dict[Location, str] = {}
         match self.select_mode:
             case Action.MOVE:
                 if self.selected_piece_to_move:
-                    if self.selected_piece_to_move.location == location:
-                        color = "yellow"
-                
-                if location in self.selected_piece_possible_moves:
+                    highlights[self.selected_piece_to_move.location] = "yellow"
+
+                for location in self.selected_piece_possible_moves:
                     if self.board.get_piece(location):
-                        color = "red"
+                        highlights[location] = "red"
                     else:
-                        color ="blue"
+                        highlights[location] = "blue"
             case Action.DROP:
-                if location in self.valid_drop_locations:
-                    color = "blue"
+                for location in self.valid_drop_locations:
+                    highlights[location] = "blue"
             case None:
                 pass
-        return color
+        return highlights
+
+    def get_highlight_texture(self, location: Location) -> str:        
+        return self.highlights.get(location, "")
     
     def draw_turns_left(self):
         fontface = "src/assets/kongtext.ttf"
-        font = pygame.font.Font(fontface, 10)
+        font = get_font(fontface, 10)
         
         num_moves = "Turns Left: " + str(3 - (self.moves_made))
 
@@ -192,14 +262,14 @@ class GameView:
             color = "#EE4B2B"
             text_y = 10
        
-        text_surface = font.render(indicator, True, color)
+        text_surface = render_text(font, indicator, color)
         text_x = SCREEN_WIDTH//2 - text_surface.get_width()//2
     
         self.screen.blit(text_surface, (text_x, text_y))
 
     def draw_player_interface(self):
         fontface = "src/assets/kongtext.ttf"
-        font = pygame.font.Font(fontface, 17)
+        font = get_font(fontface, 17)
         
         box = 55
         rad = 8 
@@ -216,22 +286,19 @@ class GameView:
         for piecekind, lst in self.red_dict.items():
             rect_color = "black"
             pygame.draw.rect(self.screen, rect_color, (red_rect_x, red_rect_y, rect_width, rect_height))
-            sprite = self.get_sprite(*datasprites["red_" + piecekind.value.lower()])
             sprite_size = int(box * 1)
-            scaled_sprite = pygame.transform.scale(sprite, (sprite_size, sprite_size))
+            scaled_sprite = self.get_scaled_sprite("red_" + piecekind.value.lower(), sprite_size)
 
             # sprite
             sprite_x = red_rect_x + (rect_width - sprite_size) // 2
             sprite_y = red_rect_y + (rect_height - sprite_size) // 2
             # Selected sprite
             if self.selected_piece_to_drop == (piecekind,Side.RED):
-                highlight_sprite = self.get_sprite(*datasprites["white"])
-                highlight_sprite.set_alpha(128)
-                self.screen.blit(pygame.transform.scale(highlight_sprite, (sprite_size, sprite_size)), (sprite_x,sprite_y))
+                self.screen.blit(self.get_scaled_sprite("white", sprite_size, 128), (sprite_x,sprite_y))
             self.screen.blit(scaled_sprite, (sprite_x, sprite_y))
 
             # text
-            text_surface = font.render(str(len(lst)), True, "white")
+            text_surface = render_text(font, str(len(lst)), "white")
             text_x = red_rect_x + (rect_width - text_surface.get_width()) // 2
             text_y = 10 + rad*2 + 5
             self.screen.blit(text_surface, (text_x, text_y))
@@ -244,22 +311,19 @@ class GameView:
         for piecekind, lst in self.blue_dict.items():
             rect_color = "black"
             pygame.draw.rect(self.screen, rect_color, (blue_rect_x, blue_rect_y, rect_width, rect_height))
-            sprite = self.get_sprite(*datasprites["blue_" + piecekind.value.lower()])
             sprite_size = int(box * 1)
-            scaled_sprite = pygame.transform.scale(sprite, (sprite_size, sprite_size))
+            scaled_sprite = self.get_scaled_sprite("blue_" + piecekind.value.lower(), sprite_size)
 
             # sprite
             sprite_x = blue_rect_x + (rect_width - sprite_size) // 2
             sprite_y = blue_rect_y + (rect_height - sprite_size) // 2
             # Selected sprite
             if self.selected_piece_to_drop == (piecekind,Side.BLUE):
-                highlight_sprite = self.get_sprite(*datasprites["white"])
-                highlight_sprite.set_alpha(128)
-                self.screen.blit(pygame.transform.scale(highlight_sprite, (sprite_size, sprite_size)), (sprite_x,sprite_y))
+                self.screen.blit(self.get_scaled_sprite("white", sprite_size, 128), (sprite_x,sprite_y))
             self.screen.blit(scaled_sprite, (sprite_x, sprite_y))
 
             # text
-            text_surface = font.render(str(len(lst)), True, "white")
+            text_surface = render_text(font, str(len(lst)), "white")
             text_x = blue_rect_x + (rect_width - text_surface.get_width()) // 2
             text_y = SCREEN_HEIGHT - (10 + rad + 35)
             self.screen.blit(text_surface, (text_x, text_y))
@@ -268,7 +332,32 @@ class GameView:
             self.sprite_click_areas[(piecekind, Side.BLUE)] = pygame.Rect(blue_rect_x, blue_rect_y, rect_width, rect_height)
             blue_rect_x += rect_width  # Add spacing between
 
-    def draw_board(self):
+    def get_terrain_layer(self) -> pygame.Surface:
+        '''Viewport-sized surface with the terrain of the current board, rendered once per variant and tile size'''
+        board = self.board
+        tile_size = self.tile_size
+        key = (board.variant, tile_size)
+        if self._terrain_layer is None or self._terrain_layer_key != key:
+            x_offset = (self.VIEWPORT_WIDTH - tile_size * board.cols) // 2
+            y_offset = (self.VIEWPORT_HEIGHT - tile_size * board.rows) // 2
+
+            layer = pygame.Surface((self.VIEWPORT_WIDTH, self.VIEWPORT_HEIGHT)).convert()
+            layer.fill("black")
+            for row in range(board.rows):
+                for col in range(board.cols):
+                    name = self.get_tile_texture(row,col)
+                    layer.blit(self.get_scaled_sprite(name, tile_size), (col * tile_size + x_offset, row * tile_size + y_offset))
+
+            self._terrain_layer = layer
+            self._terrain_layer_key = key
+        return self._terrain_layer
+
+    def draw_board(self, full: bool = True) -> list[pygame.Rect]:
+        '''
+        Composites highlights and pieces over the cached terrain layer, directly on the screen
+        When full is False, only tiles whose highlight or piece changed since the last call are redrawn
+        Returns the screen areas that were drawn
+        '''
         board = self.board
 
         VIEWPORT_WIDTH = self.VIEWPORT_WIDTH # Width of the viewport
@@ -279,51 +368,46 @@ class GameView:
         board_height = tile_size * board.rows
         x_offset = (VIEWPORT_WIDTH - board_width) // 2
         y_offset = (VIEWPORT_HEIGHT - board_height) // 2
-        
-        # Create a surface for the viewport
-        viewport = pygame.Surface((VIEWPORT_WIDTH, VIEWPORT_HEIGHT))
-        viewport.fill("black")  
+
+        terrain = self.get_terrain_layer()
+        dirty_rects: list[pygame.Rect] = []
+        if full:
+            self.screen.blit(terrain, (self.VIEWPORT_X, self.VIEWPORT_Y))
+            self._drawn_tiles.clear()
+            dirty_rects.append(pygame.Rect(self.VIEWPORT_X, self.VIEWPORT_Y, VIEWPORT_WIDTH, VIEWPORT_HEIGHT))
+
+        highlights = self.highlights
+        opacity = 128 
 
         # Note: order of rendering matters
         for row in range(board.rows):
             for col in range(board.cols):
+                location = Location(row,col)
+                piece = board.get_piece(location)
+                drawn_tile = (highlights.get(location, ""), self.get_piece_texture(piece) if piece else "")
+                if not full and self._drawn_tiles.get(location) == drawn_tile:
+                    continue
+                self._drawn_tiles[location] = drawn_tile
+                highlight_color, piece_name = drawn_tile
+
                 x = col * tile_size + x_offset
                 y = row * tile_size + y_offset
-                    
-                # Render Tile Texture
-                name = self.get_tile_texture(row,col) 
-                tile_sprite = self.get_sprite(*datasprites[name])
-                viewport.blit(pygame.transform.scale(tile_sprite, (tile_size, tile_size)), (x,y))
+                screen_pos = (x + self.VIEWPORT_X, y + self.VIEWPORT_Y)
+
+                # Restore Tile Texture
+                if not full:
+                    self.screen.blit(terrain, screen_pos, pygame.Rect(x, y, tile_size, tile_size))
+                    dirty_rects.append(pygame.Rect(*screen_pos, tile_size, tile_size))
 
                 # Render Highlight Texture
-                opacity = 128 
-                match self.select_mode:
-                    # MOVE: Render all possible moves of a selected piece 
-                    case Action.MOVE:
-                        highlight_color = self.get_highlight_texture(Location(row,col))
-                        if highlight_color:
-                            highlight_sprite = self.get_sprite(*datasprites[highlight_color])
-                            highlight_sprite.set_alpha(opacity)
-                            viewport.blit(pygame.transform.scale(highlight_sprite, (tile_size, tile_size)), (x,y))
-                    
-                    case Action.DROP:
-                    # DROP: Render all possible moves of a selected sprite
-                        highlight_color = self.get_highlight_texture(Location(row,col))
-                        if highlight_color:
-                            highlight_sprite = self.get_sprite(*datasprites[highlight_color])
-                            highlight_sprite.set_alpha(opacity)
-                            viewport.blit(pygame.transform.scale(highlight_sprite, (tile_size, tile_size)), (x,y))
-                    case None:
-                        pass
+                if highlight_color:
+                    self.screen.blit(self.get_scaled_sprite(highlight_color, tile_size, opacity), screen_pos)
 
                 # Render Piece Texture
-                piece = board.get_piece(Location(row,col))
-                if piece:
-                    piece_name = self.get_piece_texture(piece)
-                    piece_sprite = self.get_sprite(*datasprites[piece_name])
-                    viewport.blit(pygame.transform.scale(piece_sprite, (tile_size, tile_size)), (x,y))
-        
-        self.screen.blit(viewport, (self.VIEWPORT_X, self.VIEWPORT_Y))
+                if piece_name:
+                    self.screen.blit(self.get_scaled_sprite(piece_name, tile_size), screen_pos)
+
+        return dirty_rects
                 
     def draw_game_result(self):
         content = ""
@@ -344,33 +428,57 @@ class GameView:
         rect_surface.fill((255, 255, 255, 200))  # RGBA: Black with 50% opacity (128/255)
         self.screen.blit(rect_surface, (0, SCREEN_HEIGHT // 2 - rect_surface.get_height() // 2))
 
-        font = pygame.font.Font("src/assets/meow.ttf", 50)
-        text_surface = font.render(str(content), True, "black")
+        font = get_font("src/assets/meow.ttf", 50)
+        text_surface = render_text(font, str(content), "black")
         text_width = text_surface.get_width()
         text_height = text_surface.get_height()
         text_x = width//2
         text_y = height//2
         self.screen.blit(text_surface, (text_x-text_width//2, text_y-text_height//2))
 
+    def get_frame_signature(self) -> tuple:
+        '''Everything drawn outside the board tiles; when it changes, the whole screen is redrawn'''
+        return (
+            self.screen_state,
+            self.board.variant,
+            self.tile_size,
+            self.nid,
+            self.current_player.side,
+            self.moves_made,
+            self.verdict,
+            self.selected_piece_to_drop,
+            tuple(len(lst) for lst in self.red_dict.values()),
+            tuple(len(lst) for lst in self.blue_dict.values()),
+        )
+
     def draw(self):
-        self.screen.fill("black")
-        
         if self.screen_state == ScreenState.MENU:
+            self.screen.fill("black")
             self.draw_main_menu()
+            pygame.display.flip()
+            self._frame_signature = None
 
         elif self.screen_state == ScreenState.GAME:
-            self.draw_board()
-            self.draw_player_interface()
-            self.draw_game_result()
-
-        pygame.display.flip()
+            signature = self.get_frame_signature()
+            if signature != self._frame_signature:
+                self.screen.fill("black")
+                self.draw_board()
+                self.draw_player_interface()
+                self.draw_game_result()
+                pygame.display.flip()
+                self._frame_signature = signature
+            else:
+                # only tiles that changed are redrawn and pushed to the display
+                dirty_rects = self.draw_board(full=False)
+                if dirty_rects:
+                    pygame.display.update(dirty_rects)
     
     def draw_main_menu(self):
         self.screen.fill("white")
 
         # Draw the menu text
-        font = pygame.font.Font("src/assets/meow.ttf", 70) 
-        title_text = font.render("Battlegrid", True, "black")
+        font = get_font("src/assets/meow.ttf", 70) 
+        title_text = render_text(font, "Battlegrid", "black")
         self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 50))
 
         # Draw main buttons
@@ -384,8 +492,8 @@ class GameView:
                 for key in self.menu_buttons:
                     self.menu_buttons[key].draw(self.screen)
             else:
-                font = pygame.font.Font("src/assets/meow.ttf", 20) 
-                title_text = font.render("waiting for P2 to connect...", True, "black")
+                font = get_font("src/assets/meow.ttf", 20) 
+                title_text = render_text(font, "waiting for P2 to connect...", "black")
                 self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, SCREEN_HEIGHT // 2))
         
         elif self.nid == 2:
@@ -393,20 +501,53 @@ class GameView:
                 self.screen_state = ScreenState.GAME
                 self._on_new_game(self.P1_chosen_variant)
             else:
-                font = pygame.font.Font("src/assets/meow.ttf", 20) 
-                title_text = font.render("waiting for P1 to choose board...", True, "black")
+                font = get_font("src/assets/meow.ttf", 20) 
+                title_text = render_text(font, "waiting for P1 to choose board...", "black")
                 self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, SCREEN_HEIGHT // 2 ))
 
+    def get_hover_target(self, mouse_pos: tuple[int, int]) -> Location | str | None:
+        '''The menu button or board tile under the mouse'''
+        if self.screen_state == ScreenState.MENU:
+            for key, button in self.menu_buttons.items():
+                if button.is_hovered(mouse_pos):
+                    return key
+            return None
+        return self.get_grid_position(*mouse_pos)
+
+    def next_events(self) -> list[pygame.event.Event]:
+        if not self.event_driven:
+            return pygame.event.get()
+        # sleep until something happens (or IDLE_WAIT_MS passes), then take everything queued
+        event = pygame.event.wait(IDLE_WAIT_MS)
+        return [event, *pygame.event.get()]
+
     def run(self):
         clock = pygame.time.Clock()
         fps = 60
         running = True
+        needs_redraw = True
 
         while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            for event in self.next_events():
+                if event.type == pygame.NOEVENT:
+                    continue
+                elif event.type == pygame.QUIT:
                     running = False
+                elif event.type == STATE_CHANGED_EVENT:
+                    needs_redraw = True
+                elif event.type == pygame.MOUSEMOTION:
+                    hover_target = self.get_hover_target(event.pos)
+                    if hover_target != self._hover_target:
+                        self._hover_target = hover_target
+                        needs_redraw = True
+                elif event.type in (pygame.VIDEORESIZE, pygame.WINDOWEXPOSED):
+                    if event.type == pygame.VIDEORESIZE:
+                        self.invalidate_sprite_cache()
+                        self._terrain_layer = None
+                    self._frame_signature = None
+                    needs_redraw = True
                 elif event.type == pygame.MOUSEBUTTONDOWN:
+                    needs_redraw = True
                     if self.screen_state == ScreenState.MENU and self.P2_connected:
                         mouse_pos = pygame.mouse.get_pos()
                         if self.menu_buttons["1"].is_hovered(mouse_pos):
@@ -423,7 +564,9 @@ class GameView:
                             self._on_new_game(4)
                     elif self.screen_state == ScreenState.GAME:
                         self.on_click()
-            self.draw()
+            if needs_redraw or not self.event_driven:
+                self.draw()
+                needs_redraw = False
             clock.tick(fps)
         pygame.quit()
     
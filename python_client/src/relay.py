@@ -0,0 +1,219 @@
+'''
+asyncio relay server, a drop-in replacement for go_server with any number of games.
+
+It speaks the same wire format as go_server: a client first receives "<player id> " and from then on every
+payload sent by either player of its room is relayed to both of them as "<source id> <payload>".
+Connections are paired into rooms of two. A room takes new players again once both of its players left,
+so the server never has to be restarted between games.
+
+Every client has a bounded outgoing queue. A sender waits while a receiver's queue is full, and a receiver
+that stays full for SLOW_CLIENT_TIMEOUT seconds is disconnected.
+
+With --validate, every room also plays the game itself (ValidatingRoom): actions are checked with the
+rules engine before they are relayed, and illegal or malformed ones are dropped. Clients only apply
+actions once the server relays them back, so a dropped action never happened for either player.
+
+Run `poetry run python src/relay.py --port 15000` in place of `go run .`.
+'''
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+
+from websockets import ConnectionClosed
+from websockets.asyncio.server import serve, ServerConnection
+
+from classes import GameState, Side, Action
+from cs150241project_networking import MESSAGE_SIZE_LIMIT, BatchError, encode_batch, decode_batch
+from engine import GameAction, new_state, is_legal_action, apply_action
+from protocol import ConfigMessage, ActionMessage, ProtocolError, decode
+
+logger = logging.getLogger(__name__)
+
+PLAYERS_PER_ROOM = 2
+CLIENT_QUEUE_SIZE = 256
+SLOW_CLIENT_TIMEOUT = 5.0
+
+
+class RelayClient:
+    def __init__(self, websocket: ServerConnection):
+        self.websocket = websocket
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+    async def deliver(self, frame: str):
+        '''Queues a frame for this client, waiting (up to SLOW_CLIENT_TIMEOUT) while its queue is full'''
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(frame), SLOW_CLIENT_TIMEOUT)
+            except TimeoutError:
+                logger.warning(f'{self.websocket.remote_address} is not keeping up; disconnecting it')
+                await self.websocket.close()
+
+    async def send_loop(self):
+        while True:
+            frame = await self._queue.get()
+            try:
+                await self.websocket.send(frame)
+            except ConnectionClosed:
+                return
+
+
+class Room:
+    def __init__(self, number: int):
+        self.number = number
+        self.clients: dict[int, RelayClient] = {}
+        self._joined = 0            # players that joined the current game, including those who already left
+
+    @property
+    def is_open(self) -> bool:
+        return self._joined < PLAYERS_PER_ROOM
+
+    def join(self, client: RelayClient) -> int:
+        '''Seats a client and returns its player id (1 or 2)'''
+        self._joined += 1
+        player_id = self._joined
+        self.clients[player_id] = client
+        return player_id
+
+    def leave(self, player_id: int):
+        del self.clients[player_id]
+        if not self.clients:
+            # the game is over for both players, the room can host a new one
+            self._joined = 0
+
+    async def relay(self, source: int, payload: str):
+        frame = f'{source} {payload}'
+        for client in list(self.clients.values()):
+            await client.deliver(frame)
+
+
+class ValidatingRoom(Room):
+    '''Room that keeps the game state and only relays payloads that are legal in it'''
+    # player 1 plays blue, as in GameState.assign_networkID and the views
+    SIDES = {1: Side.BLUE, 2: Side.RED}
+
+    def __init__(self, number: int):
+        super().__init__(number)
+        self.state: GameState | None = None
+
+    def leave(self, player_id: int):
+        super().leave(player_id)
+        if not self.clients:
+            self.state = None
+
+    async def relay(self, source: int, payload: str):
+        # a coalesced frame is checked payload by payload
+        try:
+            parts = decode_batch(payload)
+        except BatchError:
+            logger.warning(f'Room {self.number}: dropping malformed batch frame from Player {source}: {payload!r}')
+            return
+        accepted = [part for part in parts if self.accept(source, part)]
+        if accepted:
+            await super().relay(source, encode_batch(accepted))
+
+    def accept(self, source: int, payload: str) -> bool:
+        '''Checks one payload from a player and updates the game state if it is a legal action'''
+        try:
+            message = decode(payload)
+        except ProtocolError:
+            logger.warning(f'Room {self.number}: dropping malformed payload from Player {source}: {payload!r}')
+            return False
+
+        match message:
+            case ConfigMessage(variant, _):
+                # Player 2 repeats the config of Player 1 when it starts, only Player 1 picks the board
+                if source == 1:
+                    try:
+                        self.state = new_state(variant)
+                    except RuntimeError:
+                        logger.warning(f'Room {self.number}: dropping config with unknown variant {variant}')
+                        return False
+                return True
+
+            case ActionMessage(moves, action, piece_kind, side, src, to):
+                state = self.state
+                player_side = self.SIDES.get(source)
+                if (state is None or side != player_side or state.curr_player.side != player_side
+                        or moves != state.moves_made):
+                    logger.warning(f'Room {self.number}: dropping out-of-turn action from Player {source}: {payload!r}')
+                    return False
+
+                game_action: GameAction = (action, piece_kind, src if action == Action.MOVE else None, to)
+                if not is_legal_action(state, game_action):
+                    logger.warning(f'Room {self.number}: dropping illegal action from Player {source}: {payload!r}')
+                    return False
+                apply_action(state, game_action)
+                return True
+
+        return True
+
+
+class Relay:
+    def __init__(self, max_rooms: int | None = None, validate: bool = False):
+        self._max_rooms = max_rooms
+        self._validate = validate
+        self._rooms: list[Room] = []
+
+    def make_room(self, number: int) -> Room:
+        return ValidatingRoom(number) if self._validate else Room(number)
+
+    def _find_room(self) -> Room | None:
+        for room in self._rooms:
+            if room.is_open:
+                return room
+        if self._max_rooms is not None and len(self._rooms) >= self._max_rooms:
+            return None
+        room = self.make_room(len(self._rooms) + 1)
+        self._rooms.append(room)
+        return room
+
+    async def handler(self, websocket: ServerConnection):
+        room = self._find_room()
+        if room is None:
+            logger.info(f'Rejected {websocket.remote_address}; no more space for new clients')
+            await websocket.close()
+            return
+
+        client = RelayClient(websocket)
+        player_id: int | None = None
+        sender: asyncio.Task[None] | None = None
+        # the seat is given back whatever happens once it is taken, even if the client is gone before its greeting
+        try:
+            player_id = room.join(client)
+            await websocket.send(f'{player_id} ')
+            logger.info(f'{websocket.remote_address} is now Player {player_id} of room {room.number}')
+
+            sender = asyncio.create_task(client.send_loop())
+            async for raw in websocket:
+                payload = raw if isinstance(raw, str) else raw.decode(errors='replace')
+                logger.debug(f'Received from Client {player_id} of room {room.number}: {payload}')
+                await room.relay(player_id, payload)
+        except ConnectionClosed:
+            pass
+        finally:
+            if sender is not None:
+                sender.cancel()
+            if player_id is not None:
+                room.leave(player_id)
+                logger.info(f'Player {player_id} left room {room.number}')
+
+
+async def run(relay: Relay, host: str, port: int):
+    async with serve(relay.handler, host, port, max_size=MESSAGE_SIZE_LIMIT) as server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Relay server for Battlegrid clients, with any number of rooms')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=15000, help='server port')
+    parser.add_argument('--max-rooms', type=int, default=None, help='reject players once this many rooms are in use')
+    parser.add_argument('--validate', action='store_true', help='only relay actions that are legal in the game of the room')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    logger.info(f'Starting relay server on port {args.port}...')
+    asyncio.run(run(Relay(args.max_rooms, args.validate), args.host, args.port))
@@ -0,0 +1,149 @@
+'''
+Monte Carlo playouts: plays uniformly random legal games from a position until a verdict.
+
+A RolloutEngine keeps a single mutable GameState and takes every playout back with GameModel.undo,
+so no board is copied or rebuilt between games. Games that reach max_plies without a verdict are
+counted as truncated and adjudicated with the AI evaluation (material, then crystal mobility): the side
+ahead is reported as the likely winner, separately from the games that really finished.
+
+Run `poetry run python src/rollout.py --variant 1 --games 1000` to estimate win rates of a variant.
+'''
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass, field
+import argparse
+import random
+import time
+
+from classes import GameState, Action, Piece, Location, Side, GameVerdict, piece_mappings
+from engine import new_state
+from model import GameModel, UndoRecord
+from ai import AIPlayer
+
+DEFAULT_MAX_PLIES = 600
+
+
+@dataclass
+class RolloutStats:
+    games: int = 0
+    truncated: int = 0
+    plies: int = 0
+    seconds: float = 0.0
+    verdicts: Counter[GameVerdict] = field(default_factory=Counter)
+    adjudicated: Counter[GameVerdict] = field(default_factory=Counter)     # truncated games, by who was ahead
+
+    def add(self, verdict: GameVerdict, plies: int, adjudicated: GameVerdict = GameVerdict.CONTINUE):
+        self.games += 1
+        self.plies += plies
+        if verdict == GameVerdict.CONTINUE:
+            self.truncated += 1
+            self.adjudicated[adjudicated] += 1
+        else:
+            self.verdicts[verdict] += 1
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    @property
+    def plies_per_second(self) -> float:
+        return self.plies / self.seconds if self.seconds else 0.0
+
+    def win_rate(self, verdict: GameVerdict) -> float:
+        '''Share of finished (not truncated) games that ended with the given verdict'''
+        finished = self.games - self.truncated
+        return self.verdicts[verdict] / finished if finished else 0.0
+
+    def adjudicated_rate(self, verdict: GameVerdict) -> float:
+        '''Share of truncated games in which the side of the given verdict was ahead'''
+        return self.adjudicated[verdict] / self.truncated if self.truncated else 0.0
+
+
+def adjudicate(state: GameState) -> GameVerdict:
+    '''Verdict of an unfinished game: whoever is ahead on the AI evaluation wins, an even position is a draw'''
+    score = AIPlayer(Side.BLUE).evaluate(state)
+    if score > 0:
+        return GameVerdict.BLUE_WINNER
+    if score < 0:
+        return GameVerdict.RED_WINNER
+    return GameVerdict.DRAW
+
+
+class RolloutEngine:
+    def __init__(self, state: GameState, max_plies: int = DEFAULT_MAX_PLIES, seed: int | None = None):
+        self._state = state
+        self._model = GameModel(state)
+        self._max_plies = max_plies
+        self._rng = random.Random(seed)
+
+    def random_action(self) -> tuple[Action, Piece, Location] | None:
+        '''Picks one of the current player's legal actions uniformly at random (same set as engine.legal_actions)'''
+        state = self._state
+        board = state.board
+        player = state.curr_player
+
+        moves = [(piece, board.get_valid_moves(piece)) for piece in board.get_pieces(player.side)]
+        move_count = sum(len(destinations) for _, destinations in moves)
+        droppable = [piece_kind for piece_kind, stored in player.stored_pieces.items() if stored]
+        drops = board.get_valid_drops() if droppable else ()
+        total = move_count + len(droppable) * len(drops)
+        if total == 0:
+            return None
+
+        choice = self._rng.randrange(total)
+        if choice < move_count:
+            for piece, destinations in moves:
+                if choice < len(destinations):
+                    return Action.MOVE, piece, destinations[choice]
+                choice -= len(destinations)
+
+        choice -= move_count
+        piece_kind = droppable[choice // len(drops)]
+        to = tuple(drops)[choice % len(drops)]
+        return Action.DROP, Piece(piece_mappings[piece_kind], Location(-1, -1), player.side), to
+
+    def playout(self) -> tuple[GameVerdict, int, GameVerdict]:
+        '''
+        Plays one random game and takes it back
+        Returns the verdict (CONTINUE if truncated), its length and the adjudicated verdict of a truncated game
+        '''
+        state = self._state
+        model = self._model
+        records: list[UndoRecord] = []
+        try:
+            while state.game_verdict == GameVerdict.CONTINUE and len(records) < self._max_plies:
+                chosen = self.random_action()
+                if chosen is None:
+                    break
+                records.append(model.apply(*chosen))
+            verdict = state.game_verdict
+            return verdict, len(records), adjudicate(state) if verdict == GameVerdict.CONTINUE else verdict
+        finally:
+            for record in reversed(records):
+                model.undo(record)
+
+    def run(self, games: int) -> RolloutStats:
+        stats = RolloutStats()
+        start = time.perf_counter()
+        for _ in range(games):
+            stats.add(*self.playout())
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Estimate win rates with random playouts')
+    parser.add_argument('--variant', type=int, default=1, help='board variant (see GameState.new_board)')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    stats = RolloutEngine(new_state(args.variant), args.max_plies, args.seed).run(args.games)
+
+    print(f'{stats.games} games in {stats.seconds:.2f}s ({stats.games_per_second:.1f} games/s, {stats.plies_per_second:.0f} plies/s)')
+    for verdict in (GameVerdict.BLUE_WINNER, GameVerdict.RED_WINNER, GameVerdict.DRAW):
+        print(f'- {verdict}: {stats.verdicts[verdict]} ({stats.win_rate(verdict):.1%} of finished games)')
+    print(f'- truncated after {args.max_plies} plies: {stats.truncated}, adjudicated by material and crystal mobility:')
+    for verdict in (GameVerdict.BLUE_WINNER, GameVerdict.RED_WINNER, GameVerdict.DRAW):
+        print(f'  - {verdict}: {stats.adjudicated[verdict]} ({stats.adjudicated_rate(verdict):.1%} of truncated games)')
@@ -0,0 +1,174 @@
+'''
+Self-play tournament runner: plays many headless games on every core and aggregates the verdicts.
+
+Every game is identified by (variant, seed), so any single game can be replayed on its own. Results are
+written to a JSON Lines file as soon as each game finishes, and only running totals are kept in memory.
+Games cut off at max_plies keep CONTINUE as verdict and are also adjudicated like truncated rollouts
+(see rollout.adjudicate), so every game says which side was ahead.
+
+With the ai policy, the seed picks the random opening plies played before the AI takes over, and the AI
+searches a fixed number of nodes per action instead of thinking for a fixed time, so games replay exactly.
+
+Run `poetry run python src/selfplay.py --games 1000 --out results.jsonl` to play 1000 games per variant.
+'''
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field, asdict
+from typing import Iterator
+import argparse
+import json
+import math
+import os
+import time
+
+from classes import GameVerdict, Side
+from engine import new_state, make_piece
+from model import GameModel
+from rollout import RolloutEngine, DEFAULT_MAX_PLIES, adjudicate
+from ai import AIPlayer
+
+DEFAULT_AI_NODES = 2000
+DEFAULT_OPENING_PLIES = 6
+
+VARIANTS = (1, 2, 3, 4)
+JOBS_PER_WORKER = 4     # games queued per worker, bounds the number of pending futures
+
+
+@dataclass
+class GameResult:
+    variant: int
+    seed: int
+    policy: str
+    verdict: GameVerdict
+    adjudicated: GameVerdict    # verdict of a finished game, or the side ahead when it was truncated
+    plies: int
+    blue_captures: int
+    red_captures: int
+    seconds: float
+
+
+def play_game(variant: int, seed: int, policy: str = 'random', max_plies: int = DEFAULT_MAX_PLIES,
+              ai_nodes: int = DEFAULT_AI_NODES, opening_plies: int = DEFAULT_OPENING_PLIES) -> GameResult:
+    '''Plays one game from the initial position of a variant; CONTINUE as verdict means it was truncated'''
+    start = time.perf_counter()
+    state = new_state(variant)
+    model = GameModel(state)
+    rollout = RolloutEngine(state, max_plies, seed)
+    players = {side: AIPlayer(side, math.inf, max_nodes=ai_nodes) for side in Side} if policy == 'ai' else {}
+    captures: Counter[Side] = Counter()
+
+    plies = 0
+    while state.game_verdict == GameVerdict.CONTINUE and plies < max_plies:
+        if policy == 'ai' and plies >= opening_plies:
+            game_action = players[state.curr_player.side].choose_action(state)
+            if game_action is None:
+                break
+            action, _, _, to = game_action
+            chosen = action, make_piece(state, game_action), to
+        else:
+            chosen = rollout.random_action()
+            if chosen is None:
+                break
+
+        record = model.apply(*chosen)
+        if record.captured:
+            captures[record.player.side] += 1
+        plies += 1
+
+    verdict = state.game_verdict
+    adjudicated = adjudicate(state) if verdict == GameVerdict.CONTINUE else verdict
+    return GameResult(variant, seed, policy, verdict, adjudicated, plies,
+                      captures[Side.BLUE], captures[Side.RED], time.perf_counter() - start)
+
+
+@dataclass
+class VariantSummary:
+    games: int = 0
+    plies: int = 0
+    blue_captures: int = 0
+    red_captures: int = 0
+    verdicts: Counter[GameVerdict] = field(default_factory=Counter)
+    adjudicated: Counter[GameVerdict] = field(default_factory=Counter)     # truncated games, by who was ahead
+
+    def add(self, result: GameResult):
+        self.games += 1
+        self.plies += result.plies
+        self.blue_captures += result.blue_captures
+        self.red_captures += result.red_captures
+        self.verdicts[result.verdict] += 1
+        if result.verdict == GameVerdict.CONTINUE:
+            self.adjudicated[result.adjudicated] += 1
+
+    def describe(self) -> str:
+        games = max(self.games, 1)
+        verdicts = ', '.join(
+            f'{verdict}: {self.verdicts[verdict]} ({self.verdicts[verdict] / games:.1%})'
+            for verdict in (GameVerdict.BLUE_WINNER, GameVerdict.RED_WINNER, GameVerdict.DRAW)
+        )
+        truncated = self.verdicts[GameVerdict.CONTINUE]
+        adjudicated = ' / '.join(
+            f'{verdict}: {self.adjudicated[verdict]} ({self.adjudicated[verdict] / max(truncated, 1):.1%})'
+            for verdict in (GameVerdict.BLUE_WINNER, GameVerdict.RED_WINNER, GameVerdict.DRAW)
+        )
+        verdicts += f', truncated: {truncated} (adjudicated {adjudicated})'
+        return (f'{self.games} games, {verdicts}; '
+                f'avg length {self.plies / games:.1f} plies, '
+                f'avg captures blue {self.blue_captures / games:.1f} / red {self.red_captures / games:.1f}')
+
+
+def shard(variants: tuple[int, ...], games: int, base_seed: int) -> Iterator[tuple[int, int]]:
+    '''(variant, seed) of every game; seeds only depend on the game index, not on scheduling'''
+    for variant in variants:
+        for index in range(games):
+            yield variant, base_seed + index
+
+
+def run_tournament(variants: tuple[int, ...], games: int, base_seed: int, out_path: str, workers: int,
+                   policy: str, max_plies: int, ai_nodes: int, opening_plies: int) -> dict[int, VariantSummary]:
+    summaries = {variant: VariantSummary() for variant in variants}
+    jobs = shard(variants, games, base_seed)
+    pending: set[Future[GameResult]] = set()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(out_path, 'w') as out:
+        def submit_more():
+            for variant, seed in jobs:
+                pending.add(executor.submit(play_game, variant, seed, policy, max_plies, ai_nodes, opening_plies))
+                if len(pending) >= workers * JOBS_PER_WORKER:
+                    break
+
+        submit_more()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                result = future.result()
+                summaries[result.variant].add(result)
+                out.write(json.dumps(asdict(result)) + '\n')
+            out.flush()
+            submit_more()
+
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run self-play games on all cores and aggregate the results')
+    parser.add_argument('--games', type=int, default=100, help='games per variant')
+    parser.add_argument('--variants', type=int, nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game of every variant')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--policy', choices=('random', 'ai'), default='random')
+    parser.add_argument('--ai-nodes', type=int, default=DEFAULT_AI_NODES, help='nodes searched per action by the ai policy')
+    parser.add_argument('--opening-plies', type=int, default=DEFAULT_OPENING_PLIES,
+                        help='random plies (picked by the seed) before the ai policy takes over')
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--out', default='selfplay.jsonl', help='JSON Lines file, one game per line')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summaries = run_tournament(tuple(args.variants), args.games, args.seed, args.out, args.workers,
+                               args.policy, args.max_plies, args.ai_nodes, args.opening_plies)
+
+    print(f'Played {sum(s.games for s in summaries.values())} games in {time.perf_counter() - start:.1f}s, results in {args.out}')
+    for variant, summary in summaries.items():
+        print(f'- variant {variant}: {summary.describe()}')
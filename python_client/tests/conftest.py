@@ -0,0 +1,37 @@
+from typing import Iterator
+import random
+
+import pytest
+
+from classes import GameState, GameVerdict
+from engine import new_state, legal_actions, make_action, undo_action
+
+VARIANTS = (1, 2, 3, 4)
+SEEDS = (0, 1, 2)
+PLIES = 200
+
+
+def random_walk(variant: int, seed: int, plies: int = PLIES) -> Iterator[GameState]:
+    '''Yields the state of a random game after every ply; about one ply in five takes back the last action'''
+    rng = random.Random(seed)
+    state = new_state(variant)
+    records = []
+    yield state
+    for _ in range(plies):
+        if records and rng.random() < 0.2:
+            undo_action(state, records.pop())
+        else:
+            actions = list(legal_actions(state))
+            if not actions:
+                return
+            records.append(make_action(state, rng.choice(actions)))
+        yield state
+        if state.game_verdict != GameVerdict.CONTINUE:
+            return
+
+
+@pytest.fixture(params=[(variant, seed) for variant in VARIANTS for seed in SEEDS],
+                ids=lambda param: f'variant{param[0]}-seed{param[1]}')
+def positions(request) -> Iterator[GameState]:
+    '''Positions of a random game, each one as incrementally updated by the board and GameModel'''
+    return random_walk(*request.param)
@@ -0,0 +1,31 @@
+import pytest
+from cs150241project_networking import BatchError, Message, MESSAGE_SIZE_LIMIT, encode_batch, decode_batch
+from cs150241project_networking.main import coalesce, unbatch
+
+
+@pytest.mark.parametrize('payloads', [
+    ['type:1/pid:2'],
+    ['\x1estarts with the marker'],
+    ['x:y', '', '12:ab', 'ñé'],
+    ['q' * 150, 'r' * 150, 's'],
+])
+def test_coalesced_frames_round_trip(payloads: list[str]):
+    frames = list(coalesce(payloads))
+    assert [payload for frame in frames for payload in decode_batch(frame)] == payloads
+    if len(payloads) > 1:
+        assert all(len(frame.encode()) <= MESSAGE_SIZE_LIMIT for frame in frames)
+
+
+def test_single_payload_is_sent_as_is():
+    assert encode_batch(['type:2/variant:4']) == 'type:2/variant:4'
+    assert decode_batch('type:2/variant:4') == ['type:2/variant:4']
+
+
+@pytest.mark.parametrize('frame', ['\x1ex:zz', '\x1e5:hello3:ab', '\x1e3', '\x1e-1:a', '\x1e²:ab'])
+def test_malformed_batches_raise(frame: str):
+    with pytest.raises(BatchError):
+        decode_batch(frame)
+
+
+def test_malformed_batch_is_delivered_as_one_message():
+    assert unbatch(Message.from_raw('2 \x1ex:zz')) == [Message(source=2, payload='\x1ex:zz')]
@@ -0,0 +1,86 @@
+import pytest
+
+from classes import PieceKind, Side
+from compactboard import BoardLayout, CompactBoard
+from engine import count_legal_actions
+from evaluation import PIECE_VALUES
+from model import GameModel
+
+np = pytest.importorskip('numpy')
+from bitboard import BitBoards, PositionBatch, encode_position, decode_position     # noqa: E402
+
+
+def collect(positions) -> tuple[list[CompactBoard], list[dict]]:
+    '''Snapshots of the fixture positions as compact boards, with the values Board and GameModel give them'''
+    boards: list[CompactBoard] = []
+    expected: list[dict] = []
+    for state in positions:
+        board = state.board
+        GameModel(state).check_game_result()
+        boards.append(CompactBoard.from_board(board))
+        expected.append({
+            'moves': {
+                (piece_kind, side): sum(len(board.get_valid_moves(piece)) for piece in board.get_pieces(side)
+                                        if piece.piece_kind == piece_kind)
+                for piece_kind in PieceKind for side in Side
+            },
+            'drops': len(board.get_valid_drops()),
+            'mobility': {side: board.get_crystal_mobility(side) for side in Side},
+            'verdict': state.game_verdict,
+        })
+    return boards, expected
+
+
+def test_bitboards_match_board(positions):
+    boards, expected = collect(positions)
+    bitboards = BitBoards.from_boards(boards)
+
+    for (piece_kind, side) in expected[0]['moves']:
+        assert bitboards.move_counts(piece_kind, side).tolist() == [e['moves'][piece_kind, side] for e in expected]
+    for side in Side:
+        assert bitboards.all_move_counts(side).tolist() == [
+            sum(count for (_, s), count in e['moves'].items() if s == side) for e in expected
+        ]
+        assert bitboards.crystal_mobility(side).tolist() == [e['mobility'][side] for e in expected]
+    assert bitboards.drop_counts().tolist() == [e['drops'] for e in expected]
+    assert bitboards.verdicts() == [e['verdict'] for e in expected]
+
+
+def test_encoded_positions_round_trip(positions):
+    for state in positions:
+        encoded = encode_position(state)
+        decoded = decode_position(BoardLayout.of(state.board), encoded)
+        assert encode_position(decoded) == encoded
+        assert CompactBoard.from_board(decoded.board).cells == CompactBoard.from_board(state.board).cells
+        assert decoded.curr_player.side == state.curr_player.side
+        for player, decoded_player in ((state.red_player, decoded.red_player), (state.blue_player, decoded.blue_player)):
+            assert {kind: len(stored) for kind, stored in decoded_player.stored_pieces.items()} == \
+                {kind: len(stored) for kind, stored in player.stored_pieces.items()}
+
+
+def test_batch_evaluation_matches_engine(positions):
+    encoded: list[bytes] = []
+    expected: list[dict] = []
+    layout = None
+    for state in positions:
+        board = state.board
+        layout = BoardLayout.of(board)
+        GameModel(state).check_game_result()
+        encoded.append(encode_position(state))
+        expected.append({
+            'verdict': state.game_verdict,
+            'actions': count_legal_actions(state),
+            'mobility': {side: board.get_crystal_mobility(side) for side in Side},
+            'material': {
+                player.side: sum(PIECE_VALUES[piece.piece_kind] for piece in board.get_pieces(player.side))
+                + sum(PIECE_VALUES[kind] * len(stored) for kind, stored in player.stored_pieces.items())
+                for player in (state.red_player, state.blue_player)
+            },
+        })
+
+    evaluation = PositionBatch.from_encoded(layout, encoded).evaluate()
+    assert evaluation.verdicts == [e['verdict'] for e in expected]
+    assert evaluation.legal_action_counts.tolist() == [e['actions'] for e in expected]
+    for side in Side:
+        assert evaluation.crystal_mobility[side].tolist() == [e['mobility'][side] for e in expected]
+        assert evaluation.material[side].tolist() == [e['material'][side] for e in expected]
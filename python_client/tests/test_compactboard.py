@@ -0,0 +1,22 @@
+from classes import Board, Location, Side
+from compactboard import BoardLayout, CompactBoard
+
+
+def test_is_valid_move_matches_board(positions):
+    for state in positions:
+        board = state.board
+        compact = CompactBoard.from_board(board)
+        for side in Side:
+            for piece in board.get_pieces(side):
+                # includes destinations off the board and on impassable terrain
+                for to in piece.all_possible_moves:
+                    assert compact.is_valid_move(piece, to) == board.is_valid_move(piece, to)
+                assert compact.get_valid_moves(piece) == board.get_valid_moves(piece)
+
+
+def test_layout_depends_on_terrain():
+    open_board = Board(3, 3, [], 9)
+    blocked_board = Board(3, 3, [Location(1, 1)], 9)
+    assert BoardLayout.of(open_board) is BoardLayout.of(Board(3, 3, [], 9))
+    assert BoardLayout.of(blocked_board) is not BoardLayout.of(open_board)
+    assert BoardLayout.of(blocked_board).impassable_terrain == {Location(1, 1)}
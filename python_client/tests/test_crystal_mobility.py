@@ -0,0 +1,48 @@
+from classes import Board, GameState, GameVerdict, Location, Piece, PieceKind, Side, piece_mappings
+from model import GameModel
+
+
+def free_crystal_cells(board: Board, crystal: Piece) -> list[Location]:
+    '''Cells a crystal could move to on an empty board, computed from its movement'''
+    return [
+        to for to in crystal.all_possible_moves
+        if 0 <= to.row < board.rows and 0 <= to.col < board.cols and board.get_tile(to).walkable
+    ]
+
+
+def crystals(board: Board, side: Side) -> list[Piece]:
+    return board.red_crystals if side == Side.RED else board.blue_crystals
+
+
+def test_crystal_neighbors_and_mobility_match_rebuild(positions):
+    for state in positions:
+        board = state.board
+        for side in Side:
+            neighbors = [0] * (board.rows * board.cols)
+            mobility = 0
+            for crystal in crystals(board, side):
+                assert board.get_piece(crystal.location) is crystal
+                for to in free_crystal_cells(board, crystal):
+                    neighbors[to.row * board.cols + to.col] += 1
+                    mobility += board.get_piece(to) is None
+            assert board._crystal_neighbors[side] == neighbors
+            assert board.get_crystal_mobility(side) == mobility
+
+
+def test_trapped_crystals_lose_the_game():
+    state = GameState.new_board(4)
+    board = state.board
+    model = GameModel(state)
+    for crystal in board.blue_crystals:
+        for to in board.get_valid_moves(crystal):
+            board.place_piece(Piece(piece_mappings[PieceKind.GUARD], Location(-1, -1), Side.RED), to)
+    model.check_game_result()
+    assert board.get_crystal_mobility(Side.BLUE) == 0
+    assert state.game_verdict == GameVerdict.RED_WINNER
+
+    # freeing a single cell next to a crystal gives it a move again
+    crystal = board.blue_crystals[0]
+    board.remove_piece(free_crystal_cells(board, crystal)[0])
+    model.check_game_result()
+    assert board.get_crystal_mobility(Side.BLUE) == 1
+    assert state.game_verdict == GameVerdict.CONTINUE
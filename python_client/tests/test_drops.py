@@ -0,0 +1,18 @@
+from classes import Board, Location
+
+
+def rebuilt_drops(board: Board) -> set[Location]:
+    '''Drop locations computed from scratch: empty walkable cells no crystal can move to'''
+    restricted = set(board.impassable_terrain)
+    for crystal in board.red_crystals + board.blue_crystals:
+        restricted.update(board.get_valid_moves(crystal))
+    return {
+        location
+        for i in range(board.rows) for j in range(board.cols)
+        if board.get_piece(location := Location(i, j)) is None and location not in restricted
+    }
+
+
+def test_drops_match_rebuild(positions):
+    for state in positions:
+        assert set(state.board.get_valid_drops()) == rebuilt_drops(state.board)
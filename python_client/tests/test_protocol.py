@@ -0,0 +1,95 @@
+import base64
+import itertools
+
+import pytest
+
+from classes import Action, Location, PieceKind, Side
+from protocol import (ACTION_STRUCT, WIRE_KIND_CODES, ActionMessage, ConfigMessage, PlayerInMessage, ProtocolError,
+                      WireFormat, adopted_wire, agreed_wire, decode, encode)
+
+MOVE = ActionMessage(2, Action.MOVE, PieceKind.MAGE, Side.RED, Location(7, 3), Location(6, 3))
+DROP = ActionMessage(0, Action.DROP, PieceKind.CRYSTAL, Side.BLUE, Location(-1, -1), Location(4, 9))
+
+
+@pytest.mark.parametrize('message', [
+    PlayerInMessage(1), PlayerInMessage(2, WireFormat.BINARY),
+    ConfigMessage(3), ConfigMessage(4, WireFormat.BINARY),
+    MOVE, DROP,
+    *(ActionMessage(1, Action.MOVE, kind, side, Location(0, 0), Location(15, 9)) for kind in PieceKind for side in Side),
+])
+@pytest.mark.parametrize('wire', list(WireFormat))
+def test_round_trip(message, wire):
+    assert decode(encode(message, wire)) == message
+
+
+def test_binary_format_is_pinned():
+    assert WIRE_KIND_CODES == {
+        PieceKind.SWORDSMAN: 1, PieceKind.MAGE: 2, PieceKind.ARCHER: 3,
+        PieceKind.GUARD: 4, PieceKind.LONGSWORD: 5, PieceKind.CRYSTAL: 6,
+    }
+    assert encode(MOVE, WireFormat.BINARY) == '#AwIBAgEHAwYD'
+    assert encode(DROP, WireFormat.BINARY) == '#AwACBgL//wQJ'
+    assert encode(MOVE) == 'type:3/moves:2/action:1/pkind:Mage/pside:1/prow:7/pcol:3/torow:6/toloc:3'
+
+
+def binary(*fields: int) -> str:
+    return '#' + base64.b64encode(ACTION_STRUCT.pack(*fields)).decode('ascii')
+
+
+@pytest.mark.parametrize('payload', [
+    '',
+    'hello',
+    'type:3/moves:0',
+    'type:9/pid:1',
+    'type:1/pid:two',
+    'type:3/moves:0/action:7/pkind:Mage/pside:1/prow:7/pcol:3/torow:6/toloc:3',
+    'type:3/moves:0/action:1/pkind:Queen/pside:1/prow:7/pcol:3/torow:6/toloc:3',
+    '#',
+    '#not base64!',
+    '#' + base64.b64encode(b'\x03\x00\x01').decode('ascii'),
+    binary(1, 0, 1, 2, 1, 7, 3, 6, 3),       # not a MADE_ACTION
+    binary(3, 0, 9, 2, 1, 7, 3, 6, 3),       # unknown action
+    binary(3, 0, 1, 0, 1, 7, 3, 6, 3),       # unknown piece kind
+    binary(3, 0, 1, 2, 5, 7, 3, 6, 3),       # unknown side
+])
+def test_malformed_payloads_raise(payload):
+    with pytest.raises(ProtocolError):
+        decode(payload)
+
+
+def old_client_field(payload: str) -> str:
+    '''How clients from before the binary format read PLAYER_IN and SEND_CONFIG: the second token, by position'''
+    return payload.strip().split('/')[1].split(':')[1]
+
+
+@pytest.mark.parametrize('player1_new, player2_new', list(itertools.product((False, True), repeat=2)))
+def test_negotiation(player1_new, player2_new):
+    offers = {
+        1: WireFormat.BINARY if player1_new else WireFormat.TEXT,
+        2: WireFormat.BINARY if player2_new else WireFormat.TEXT,
+    }
+
+    # Player 2 announces itself, Player 1 settles the format
+    player_in = encode(PlayerInMessage(2, offers[2]))
+    if player1_new:
+        received = decode(player_in)
+        assert isinstance(received, PlayerInMessage)
+        agreed = agreed_wire(offers[1], received.wire)
+    else:
+        assert old_client_field(player_in) == '2'
+        agreed = WireFormat.TEXT
+
+    # Player 1 sends the board config, both players adopt the format it announces
+    config = encode(ConfigMessage(4, agreed))
+    wires = {}
+    for player, new in ((1, player1_new), (2, player2_new)):
+        if new:
+            received = decode(config)
+            assert isinstance(received, ConfigMessage) and received.variant == 4
+            wires[player] = adopted_wire(offers[player], received.wire)
+        else:
+            assert old_client_field(config) == '4'
+            wires[player] = WireFormat.TEXT
+
+    expected = WireFormat.BINARY if player1_new and player2_new else WireFormat.TEXT
+    assert wires == {1: expected, 2: expected}
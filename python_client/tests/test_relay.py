@@ -0,0 +1,69 @@
+import asyncio
+from websockets import ConnectionClosed
+from classes import Side
+from engine import new_state, legal_actions
+from protocol import ConfigMessage, ActionMessage, WireFormat, encode
+from relay import Relay, ValidatingRoom
+
+
+class RecordingClient:
+    def __init__(self):
+        self.frames: list[str] = []
+
+    async def deliver(self, frame: str):
+        self.frames.append(frame)
+
+
+def make_room() -> tuple[ValidatingRoom, RecordingClient]:
+    room = ValidatingRoom(1)
+    client = RecordingClient()
+    room.join(client)  # type: ignore[arg-type]
+    asyncio.run(room.relay(1, encode(ConfigMessage(4))))
+    return room, client
+
+
+def first_action_payload(wire: WireFormat = WireFormat.TEXT) -> str:
+    action, piece_kind, src, to = next(iter(legal_actions(new_state(4))))
+    assert src is not None
+    return encode(ActionMessage(0, action, piece_kind, Side.BLUE, src, to), wire)
+
+
+def test_legal_action_is_relayed_and_applied():
+    room, client = make_room()
+    asyncio.run(room.relay(1, first_action_payload(WireFormat.BINARY)))
+    assert client.frames[-1] == '1 ' + first_action_payload(WireFormat.BINARY)
+    assert room.state is not None and room.state.moves_made == 1
+
+
+def test_out_of_turn_action_is_dropped():
+    room, client = make_room()
+    asyncio.run(room.relay(2, first_action_payload()))
+    assert len(client.frames) == 1
+    assert room.state is not None and room.state.moves_made == 0
+
+
+def test_malformed_batch_frame_is_dropped():
+    room, client = make_room()
+    asyncio.run(room.relay(1, '\x1ex:zz'))
+    asyncio.run(room.relay(1, '\x1e5:hello3:ab'))
+    assert len(client.frames) == 1
+    # the room keeps playing afterwards
+    asyncio.run(room.relay(1, first_action_payload()))
+    assert len(client.frames) == 2
+
+
+class GoneWebSocket:
+    '''Connection that is already closed when the relay greets it'''
+    remote_address = ('127.0.0.1', 0)
+
+    async def send(self, frame: str):
+        raise ConnectionClosed(None, None)
+
+
+def test_seat_is_freed_when_client_leaves_before_greeting():
+    relay = Relay()
+    asyncio.run(relay.handler(GoneWebSocket()))  # type: ignore[arg-type]
+    room = relay._find_room()
+    assert room is not None and room.number == 1
+    assert room.is_open and not room.clients
+    assert room.join(RecordingClient()) == 1  # type: ignore[arg-type]
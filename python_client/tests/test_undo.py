@@ -0,0 +1,37 @@
+import random
+
+from classes import GameState, Location
+from engine import legal_actions, make_action, undo_action
+
+
+def snapshot(state: GameState) -> tuple:
+    '''Everything an action can change, with pieces by identity so that undo must restore the same objects'''
+    board = state.board
+    cells = tuple(
+        (id(piece), piece.piece_kind, piece.side) if (piece := board.get_piece(Location(i, j))) else None
+        for i in range(board.rows) for j in range(board.cols)
+    )
+    stored = tuple(
+        (piece_kind, tuple((id(piece), piece.side) for piece in pieces))
+        for player in (state.red_player, state.blue_player)
+        for piece_kind, pieces in player.stored_pieces.items()
+    )
+    crystals = tuple((id(crystal), crystal.location) for crystal in board.red_crystals + board.blue_crystals)
+    return (cells, stored, crystals, state.moves_made, state.curr_player.side, state.game_verdict,
+            frozenset(board.get_valid_drops()), state.zobrist_hash)
+
+
+def test_undo_restores_position(positions):
+    rng = random.Random(0)
+    for state in positions:
+        before = snapshot(state)
+        records = []
+        # several actions in a row, so that turn changes and game ends are taken back too
+        for _ in range(rng.randint(1, 5)):
+            actions = list(legal_actions(state))
+            if not actions:
+                break
+            records.append(make_action(state, rng.choice(actions)))
+        for record in reversed(records):
+            undo_action(state, record)
+        assert snapshot(state) == before
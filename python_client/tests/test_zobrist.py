@@ -0,0 +1,30 @@
+from classes import (GameState, Location, Side, zobrist_cell_keys,
+                     ZOBRIST_STORED_KEYS, ZOBRIST_RED_TO_MOVE_KEY, ZOBRIST_MOVES_MADE_KEYS)
+from engine import clone_state
+
+
+def rebuilt_hash(state: GameState) -> int:
+    '''Zobrist hash computed from scratch from the pieces on the board and in store'''
+    board = state.board
+    keys = zobrist_cell_keys(board.rows * board.cols)
+    h = 0
+    for i in range(board.rows):
+        for j in range(board.cols):
+            if piece := board.get_piece(Location(i, j)):
+                h ^= keys[piece.piece_kind, piece.side][i * board.cols + j]
+    for player in (state.red_player, state.blue_player):
+        for piece_kind, stored in player.stored_pieces.items():
+            h ^= ZOBRIST_STORED_KEYS[player.side, piece_kind][len(stored)]
+    if state.curr_player.side == Side.RED:
+        h ^= ZOBRIST_RED_TO_MOVE_KEY
+    return h ^ ZOBRIST_MOVES_MADE_KEYS[state.moves_made]
+
+
+def test_hash_matches_rebuild(positions):
+    for state in positions:
+        assert state.zobrist_hash == rebuilt_hash(state)
+
+
+def test_clone_has_same_hash(positions):
+    for state in positions:
+        assert clone_state(state).zobrist_hash == state.zobrist_hash